@@ -6,6 +6,7 @@ Main module for running the package as a Python module from console:
 
 import sys
 import logging
+from typing import Iterable
 from argparse import ArgumentParser, Namespace
 from webbrowser import open as open_browser
 
@@ -19,6 +20,9 @@ from bear.output import (
     load_duplicates_from_hashfiles
 )
 from bear.context import Context
+from bear.extsort import stream_duplicates, convert_hashfiles
+from bear.actions import LinkEngine
+from bear.throttle import set_rates
 
 LOG = logging.getLogger(__name__)
 logging.basicConfig(
@@ -60,26 +64,85 @@ def handle_duplicates(ctx: Context, hasher: Hasher):
     Handle --duplicate related behavior.
     """
 
-    duplicates = find_duplicates(ctx=ctx, hasher=hasher)
+    hardlinks = {}
+    duplicates = find_duplicates(ctx=ctx, hasher=hasher, hardlinks=hardlinks)
+    LOG.info('Found %d duplicates, %d bytes reclaimable', len(duplicates), sum(
+        files[0].size * (len(files) - 1) for files in duplicates.values()
+        if files
+    ))
     output_duplicates(hashes=duplicates, out=ctx.output)
-    if ctx.keep_oldest:
-        remove_except_oldest(files=duplicates.values())
-    elif ctx.keep_newest:
-        remove_except_newest(files=duplicates.values())
+    if ctx.hardlinks:
+        output_duplicates(hashes={
+            f'{device}:{inode}': files
+            for (device, inode), files in hardlinks.items()
+        }, out=ctx.hardlinks)
+    remove_duplicates(ctx=ctx, groups=duplicates.values())
+
+
+@ensure_annotations
+def remove_duplicates(ctx: Context, groups: Iterable):
+    """
+    Remove or link the duplicates in each group of files (paths or
+    FileRecord objects) depending on the CLI options.
+    """
+    if ctx.link:
+        link_duplicates(ctx=ctx, groups=groups)
+        return
+    for files in groups:
+        if ctx.keep_oldest:
+            remove_except_oldest(files=files)
+        elif ctx.keep_newest:
+            remove_except_newest(files=files)
+
+
+@ensure_annotations
+def link_duplicates(ctx: Context, groups: Iterable):
+    """
+    Replace duplicates with hardlinks to the oldest file of each group.
+    """
+    with LinkEngine(jobs=ctx.jobs) as engine:
+        for files in groups:
+            engine.add(files=files)
+
+
+def keep_streamed(ctx: Context, duplicates):
+    """
+    Pass through (hash, files) pairs of streamed duplicates and remove
+    the files of each pair after it's written into the output.
+    """
+    with LinkEngine(jobs=ctx.jobs) as engine:
+        for key, files in duplicates:
+            yield key, files
+            if ctx.keep_oldest:
+                remove_except_oldest(files=files)
+            elif ctx.keep_newest:
+                remove_except_newest(files=files)
+            elif ctx.link:
+                engine.add(files=files)
 
 
 @ensure_annotations
 def load_hashes(ctx: Context):
     """
     Load tab-separated hash+path lines from files
+
+    With a memory limit the duplicates are found with an external sort
+    and streamed into the output instead of loading them all at once.
     """
 
+    if ctx.memory_limit:
+        duplicates = stream_duplicates(
+            hashfiles=ctx.hashfiles, memory_limit=ctx.memory_limit
+        )
+        output_duplicates(
+            hashes=keep_streamed(ctx=ctx, duplicates=duplicates),
+            out=ctx.output
+        )
+        return
+
     duplicates = load_duplicates_from_hashfiles(ctx=ctx)
     output_duplicates(hashes=duplicates, out=ctx.output)
-    if ctx.keep_oldest:
-        remove_except_oldest(files=duplicates.values())
-    elif ctx.keep_newest:
-        remove_except_newest(files=duplicates.values())
+    remove_duplicates(ctx=ctx, groups=duplicates.values())
 
 
 @ensure_annotations
@@ -107,6 +170,7 @@ def main(args: Namespace):
     LOG.debug('Context: %s', vars(ctx))
 
     hasher = ctx.hasher
+    set_rates(read_rate=ctx.max_read_rate, open_rate=ctx.max_open_rate)
 
     # actions
     if ctx.files:
@@ -131,6 +195,11 @@ def main(args: Namespace):
         print(VERSION)
     elif ctx.community:
         open_browser(COMMUNITY_URL)
+    elif ctx.write_index:
+        convert_hashfiles(
+            hashfiles=ctx.hashfiles, out=ctx.write_index,
+            memory_limit=ctx.memory_limit
+        )
     elif ctx.load_hashes:
         if not ctx.hashfiles:
             ctx.hashfiles = ctx.load_hashes
@@ -155,15 +224,37 @@ def run():
     """
     CLI arguments parser for the main function.
     """
+    # pylint: disable=too-many-statements
     parser = BearArgumentParser(prog=NAME)
     parser.add_argument(
         '-j', '--jobs', action='store', type=int, default=1,
         help='set how many processes will be spawn for hashing, 0=max'
     )
+    parser.add_argument(
+        '--backend', action='store', type=str, default='processes',
+        choices=['processes', 'threads'], help=(
+            'hash in a pool of processes or threads, threads avoid'
+            ' the startup and the transfer of the results between processes'
+        )
+    )
+    parser.add_argument(
+        '--walk-jobs', metavar='COUNT', action='store', type=int, default=1,
+        help=(
+            'set how many threads will list folders in parallel, useful'
+            ' for network filesystems'
+        )
+    )
     parser.add_argument(
         '-o', '--output', action='store', type=str, default='',
         help='output file for the list of duplicates'
     )
+    parser.add_argument(
+        '--hardlinks', metavar='FILE', action='store', type=str,
+        default='', help=(
+            'output file for the paths sharing an inode (device:inode),'
+            ' hashed only once and never removed as duplicates'
+        )
+    )
     parser.add_argument(
         '-x', '--exclude', metavar="VALUE",
         type=str, nargs="+", default=[],
@@ -178,9 +269,74 @@ def run():
         "--max-size", metavar="BYTES", action="store", type=int, default=0,
         help="exclude files if their size is above the limit, 0=unlimited"
     )
+    parser.add_argument(
+        "--head-size", metavar="BYTES", action="store", type=int,
+        default=4096, help=(
+            "hash only this many bytes from the start of the files with"
+            " the same size before hashing them completely, 0=skip"
+        )
+    )
+    parser.add_argument(
+        "--tail-size", metavar="BYTES", action="store", type=int,
+        default=4096, help=(
+            "hash only this many bytes from the end of the files with"
+            " the same size and head before hashing them completely, 0=skip"
+        )
+    )
+    parser.add_argument(
+        "--mmap-size", metavar="BYTES", action="store", type=int, default=0,
+        help=(
+            "memory-map files bigger than this size for hashing instead of"
+            " reading them through a buffer, 0=never"
+        )
+    )
+    parser.add_argument(
+        '--cache', metavar='FILE', action='store', type=str, default='',
+        help='persistent cache of file hashes to skip reading unchanged files'
+    )
+    parser.add_argument(
+        '--cache-age', metavar='DAYS', action='store', type=int, default=30,
+        help='remove cached hashes not used for this many days, 0=never'
+    )
+    parser.add_argument(
+        '--cache-entries', metavar='COUNT', action='store', type=int,
+        default=0, help=(
+            'keep only this many most recently used cached hashes, '
+            '0=unlimited'
+        )
+    )
+    parser.add_argument(
+        '--incremental', metavar='FILE', action='store', type=str,
+        default='', help=(
+            'index of the previous --duplicates scan, list and hash again'
+            ' only the folders and files changed since then'
+        )
+    )
+    parser.add_argument(
+        '--resume', metavar='DIR', action='store', type=str, default='',
+        help=(
+            'keep the journal of computed hashes in this folder and hash'
+            ' again only the files missing or changed in it, removed'
+            ' when the --duplicates scan finishes'
+        )
+    )
     parser.add_argument(
         '--hashfiles', metavar='FILE', type=str, nargs='+', default=[],
-        help='files containing hash+path lines'
+        help='files containing hash+path lines or binary indexes'
+    )
+    parser.add_argument(
+        '--memory-limit', metavar='BYTES', action='store', type=int,
+        default=0, help=(
+            'sort the --hashfiles for --load-hashes in temporary files'
+            ' above this much memory, 0=unlimited'
+        )
+    )
+    parser.add_argument(
+        '--write-index', metavar='FILE', action='store', type=str,
+        default='', help=(
+            'convert the --hashfiles into a binary index, faster to load'
+            ' with --load-hashes'
+        )
     )
 
     group_verbosity = parser.add_mutually_exclusive_group()
@@ -237,6 +393,12 @@ def run():
         '-n', '--keep-newest', action='store_true',
         help='in combination with --duplicates keep only single newest file'
     )
+    group_remove.add_argument(
+        '--link', action='store_true', help=(
+            'in combination with --duplicates replace all files except'
+            ' single oldest one with hardlinks to it'
+        )
+    )
 
     group_hash = parser.add_mutually_exclusive_group()
     group_hash.add_argument(
@@ -251,7 +413,105 @@ def run():
         '--sha256', action='store_true',
         help='use SHA256 function for hashing'
     )
-    main(parser.parse_args())
+    group_hash.add_argument(
+        '--xxh3', action='store_true', help=(
+            'use XXH3 64-bit non-cryptographic function for hashing'
+            ' (requires xxhash package)'
+        )
+    )
+    group_hash.add_argument(
+        '--xxh128', action='store_true', help=(
+            'use XXH3 128-bit non-cryptographic function for hashing'
+            ' (requires xxhash package)'
+        )
+    )
+    group_hash.add_argument(
+        '--blake3', action='store_true', help=(
+            'use BLAKE3 function for hashing (requires blake3 package)'
+        )
+    )
+    parser.add_argument(
+        '--prefetch', action='store_true', help=(
+            'open the next files and read the next block ahead in background'
+            ' threads of each hashing job, hides the latency of spinning'
+            ' disks and network mounts'
+        )
+    )
+    parser.add_argument(
+        '--drop-cache', action='store_true', help=(
+            'drop the hashed files from the page cache after hashing them,'
+            ' so that the cache of other programs is not evicted'
+        )
+    )
+    parser.add_argument(
+        '--direct-io', action='store_true', help=(
+            'read whole files with O_DIRECT bypassing the page cache'
+            ' if supported by the filesystem (Linux)'
+        )
+    )
+    parser.add_argument(
+        '--device-pools', action='store_true', help=(
+            'hash the files of each device in its own pool of jobs at once,'
+            ' rotational disks get only --rotational-jobs to avoid seeking'
+        )
+    )
+    parser.add_argument(
+        '--rotational-jobs', metavar='N', action='store', type=int,
+        default=2, help=(
+            'set how many jobs hash the files of a rotational disk'
+            ' with --device-pools (default: 2)'
+        )
+    )
+    parser.add_argument(
+        '--max-read-rate', metavar='BYTES', action='store', type=int,
+        default=0, help=(
+            'limit the bytes read per second by all of the hashing jobs'
+            ' together (default: 0, unlimited)'
+        )
+    )
+    parser.add_argument(
+        '--max-open-rate', metavar='N', action='store', type=int,
+        default=0, help=(
+            'limit the files and folders opened or stat()-ed per second'
+            ' while traversing and hashing (default: 0, unlimited)'
+        )
+    )
+    parser.add_argument(
+        '--tree-hash', action='store_true', help=(
+            'hash files as 16 MiB segments combined into a root digest,'
+            ' segments of a big file are hashed concurrently (the digests'
+            ' differ from the plain ones of the hashing function)'
+        )
+    )
+    parser.add_argument(
+        '--tree-jobs', metavar='N', action='store', type=int, default=0,
+        help=(
+            'set how many threads hash the segments of a big file in each'
+            ' job with a tree hash (default: 0, the cores divided by jobs)'
+        )
+    )
+    parser.add_argument(
+        '--fingerprint', action='store', type=str, default='',
+        choices=[hasher.name.lower() for hasher in Hasher], help=(
+            'group the candidates by a fast hash (e.g. xxh3) first and use'
+            ' the hashing function only for the files colliding in it'
+        )
+    )
+    parser.add_argument(
+        '--compare-group', metavar='N', action='store', type=int, default=0,
+        help=(
+            'compare files of same size groups with at most N files block'
+            ' by block instead of hashing them, stops reading a file as soon'
+            ' as it differs from the rest (default: 0, off)'
+        )
+    )
+    args = parser.parse_args()
+    try:
+        # e.g. a hasher from a missing optional package
+        Context(args)
+    except ValueError as exc:
+        parser.error(str(exc))
+    main(args)
 
 
 if __name__ == '__main__':
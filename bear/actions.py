@@ -0,0 +1,150 @@
+"""
+Module for actions applied on the found duplicates.
+"""
+
+import logging
+from errno import EXDEV
+from collections import deque
+from os import link, rename, remove, stat, getpid, cpu_count
+from multiprocessing.pool import ThreadPool
+from typing import Iterable
+from ensure import ensure_annotations
+
+from bear.common import FileRecord, file_mtime
+
+LOG = logging.getLogger(__name__)
+
+# duplicates linked in a single task of the pool
+ACTION_BATCH = 256
+
+
+@ensure_annotations
+def link_file(source: FileRecord, target: FileRecord):
+    """
+    Atomically replace a target file with a hardlink to a source file
+    by creating the link under a temporary name renamed over the target,
+    so the target path exists during the whole operation.
+
+    Hardlinks can't cross devices, such a target is only removed.
+    """
+    if source.device != target.device:
+        remove(target.path)
+        return
+
+    temp = f'{target.path}.bear{getpid()}'
+    try:
+        link(source.path, temp)
+    except OSError as exc:
+        if exc.errno != EXDEV:
+            raise
+        remove(target.path)
+        return
+
+    try:
+        rename(temp, target.path)
+    except OSError:
+        remove(temp)
+        raise
+
+
+@ensure_annotations
+def link_batch(pairs: list) -> int:
+    """
+    Replace the duplicates in (kept, duplicate) FileRecord pairs with
+    hardlinks and return the count of the replaced ones.
+    """
+    count = 0
+    for source, target in pairs:
+        try:
+            link_file(source=source, target=target)
+        except OSError as exc:
+            LOG.warning(
+                'Could not link file %s! Skipping. (%s)', target.path, exc
+            )
+            continue
+        count += 1
+    return count
+
+
+class LinkEngine:
+    """
+    Batched parallel engine replacing all files in groups of duplicates
+    except the single oldest one with hardlinks to it.
+
+    The linking runs in threads in batches of (kept, duplicate) pairs
+    submitted as soon as they are full, so that streamed groups don't
+    need to be collected first. The stat() data of the traversal is
+    reused and only plain paths (from hashfiles) are stat()-ed again.
+
+    The jobs are the same as for hashing, 0 for max.
+    """
+
+    @ensure_annotations
+    def __init__(self, jobs: int = 1):
+        self.jobs = jobs if jobs != 0 else cpu_count()
+        self.pool = ThreadPool(processes=self.jobs)
+        self.pending = []
+        self.results = deque()
+        self.total = 0
+        self.linked = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    @ensure_annotations
+    def add(self, files: Iterable):
+        """
+        Add a group of duplicates (paths or FileRecord objects).
+        """
+        group = []
+        for item in files:
+            if isinstance(item, FileRecord):
+                group.append(item)
+                continue
+            try:
+                group.append(FileRecord.from_stat(path=item, info=stat(item)))
+            except OSError:
+                LOG.warning('Could not stat file %s! Skipping.', item)
+        if not group:
+            return
+
+        # oldest == smallest timestamp
+        group.sort(key=file_mtime)
+        self.pending.extend(
+            (group[0], item) for item in group[1:]
+            # already the same file
+            if not item.inode or (item.device, item.inode) != (
+                group[0].device, group[0].inode
+            )
+        )
+        if len(self.pending) >= ACTION_BATCH:
+            self.submit()
+
+    def submit(self):
+        """
+        Submit the pending pairs as a batch into the pool.
+        """
+        if self.pending:
+            self.total += len(self.pending)
+            self.results.append(
+                self.pool.apply_async(link_batch, (self.pending, ))
+            )
+            self.pending = []
+
+        # keep only a few batches queued
+        while len(self.results) > self.jobs * 2:
+            self.linked += self.results.popleft().get()
+
+    def close(self):
+        """
+        Link the pending pairs and wait for all of the batches.
+        """
+        self.submit()
+        while self.results:
+            self.linked += self.results.popleft().get()
+        self.pool.close()
+        self.pool.join()
+        LOG.info('Linked %d of %d duplicates', self.linked, self.total)
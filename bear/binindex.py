@@ -0,0 +1,210 @@
+"""
+Module for the binary index of file hashes.
+"""
+
+import logging
+from os import fsencode, fsdecode
+from os.path import split, join
+from mmap import mmap, ACCESS_READ
+from struct import Struct
+from heapq import merge
+from itertools import groupby, repeat
+from ensure import ensure_annotations
+
+
+LOG = logging.getLogger(__name__)
+
+MAGIC = b'BEARIDX1'
+# magic, digest size, entries count, strings count
+HEADER = Struct('<8sIQQ')
+OFFSET = Struct('<Q')
+
+
+@ensure_annotations
+def entry_struct(digest_size: int) -> Struct:
+    """
+    Create a struct of an index entry, raw digest, file size (-1 if
+    unknown) and the indexes of the folder and the file name strings.
+    """
+    return Struct(f'<{digest_size}sqII')
+
+
+@ensure_annotations
+def is_index(path: str) -> bool:
+    """
+    Check if a file is a binary index instead of a text hashfile.
+    """
+    with open(path, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def write_strings(file, strings: list):
+    """
+    Write the offsets and the encoded strings of a string table.
+    """
+    blobs = [fsencode(value) for value in strings]
+    offset = 0
+    for blob in blobs:
+        file.write(OFFSET.pack(offset))
+        offset += len(blob)
+    file.write(OFFSET.pack(offset))
+    for blob in blobs:
+        file.write(blob)
+
+
+@ensure_annotations
+def write_index(entries: list, out: str):
+    """
+    Write (hex hash, path, size) entries into a binary index sorted
+    by digest, see write_sorted_index().
+    """
+    # stable sort, files with the same digest keep their order
+    write_sorted_index(
+        entries=sorted(entries, key=lambda entry: bytes.fromhex(entry[0])),
+        out=out
+    )
+
+
+@ensure_annotations
+def write_sorted_index(entries, out: str):
+    """
+    Write (hex hash, path, size) entries already sorted by digest into
+    a binary index, one by one:
+
+    <header>
+    <entries sorted by digest>
+    <offsets of strings, one more for the end of the last string>
+    <strings>
+
+    Folders and file names are stored only once in the string table
+    and referenced by their position in it from the entries.
+    """
+    strings = {}
+    count = 0
+    digest_size = 0
+    entry = None
+
+    with open(out, 'wb') as file:
+        # rewritten with the counts once all the entries are written
+        file.write(HEADER.pack(MAGIC, 0, 0, 0))
+        for value, path, size in entries:
+            digest = bytes.fromhex(value)
+            if not digest_size:
+                digest_size = len(digest)
+                entry = entry_struct(digest_size)
+            elif len(digest) != digest_size:
+                raise ValueError(f'Mixed digest sizes for index {out}')
+            folder, name = split(path)
+            file.write(entry.pack(
+                digest, size,
+                strings.setdefault(folder, len(strings)),
+                strings.setdefault(name, len(strings))
+            ))
+            count += 1
+        write_strings(file=file, strings=list(strings))
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, digest_size, count, len(strings)))
+    LOG.info('Written %d entries into index %s', count, out)
+
+
+class HashIndex:
+    """
+    Read-only binary index of file hashes memory-mapped from a file,
+    the entries are read directly from the mapped pages when needed.
+    """
+
+    @ensure_annotations
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.data = mmap(file.fileno(), 0, access=ACCESS_READ)
+
+        magic, self.digest_size, self.count, strings = HEADER.unpack_from(
+            self.data
+        )
+        if magic != MAGIC:
+            self.data.close()
+            raise ValueError(f'File {path} is not a binary index')
+
+        self.entry = entry_struct(self.digest_size)
+        self.offsets = HEADER.size + self.count * self.entry.size
+        self.strings = self.offsets + (strings + 1) * OFFSET.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    @ensure_annotations
+    def digest(self, idx: int) -> bytes:
+        """
+        Get the raw digest of an entry without reading the rest of it.
+        """
+        start = HEADER.size + idx * self.entry.size
+        return self.data[start:start + self.digest_size]
+
+    @ensure_annotations
+    def string(self, idx: int) -> str:
+        """
+        Get a string from the string table.
+        """
+        start, end = [
+            OFFSET.unpack_from(self.data, self.offsets + pos * OFFSET.size)[0]
+            for pos in (idx, idx + 1)
+        ]
+        return fsdecode(self.data[self.strings + start:self.strings + end])
+
+    @ensure_annotations
+    def entry_path(self, idx: int) -> str:
+        """
+        Get the path of a file in an entry.
+        """
+        _, _, folder, name = self.entry.unpack_from(
+            self.data, HEADER.size + idx * self.entry.size
+        )
+        return join(self.string(folder), self.string(name))
+
+    def digests(self):
+        """
+        Iterate over (digest, entry index) pairs in the sorted order.
+        """
+        for idx in range(self.count):
+            yield self.digest(idx), idx
+
+    def close(self):
+        """
+        Unmap the index file.
+        """
+        self.data.close()
+
+
+@ensure_annotations
+def load_indexes(paths: list) -> dict:
+    """
+    Find duplicates in binary indexes with a linear scan over the sorted
+    digests (merged if multiple indexes), the paths are read only for
+    the runs of the same digest with more than a single file.
+    """
+    result = {}
+    indexes = [HashIndex(path) for path in paths]
+    try:
+        digests = merge(*[
+            zip(index.digests(), repeat(pos))
+            for pos, index in enumerate(indexes)
+        ], key=lambda item: item[0][0])
+
+        for digest, run in groupby(digests, key=lambda item: item[0][0]):
+            run = list(run)
+            if len(run) < 2:
+                continue
+            result[digest.hex()] = [
+                indexes[pos].entry_path(idx) for (_, idx), pos in run
+            ]
+    finally:
+        for index in indexes:
+            index.close()
+    return result
@@ -0,0 +1,144 @@
+"""
+Module for the persistent cache of file hashes.
+"""
+
+import logging
+import sqlite3
+from time import time
+from ensure import ensure_annotations
+
+from bear.common import Hasher, FileRecord
+
+LOG = logging.getLogger(__name__)
+DAY = 24 * 60 * 60
+
+
+class HashCache:
+    """
+    Persistent SQLite cache of file hashes keyed by the identity of a file
+    from stat() (device, inode, size, modification time) and the hashing
+    algorithm, so that unchanged files don't need to be read again.
+
+    Writes are batched and committed only after a number of changes
+    to keep the database fast with many concurrent processes.
+    """
+
+    batch: int = 1000
+
+    @ensure_annotations
+    def __init__(self, path: str):
+        self.path = path
+        self.inserted = []
+        self.used = []
+
+        self.database = sqlite3.connect(path, timeout=60)
+        self.database.execute('PRAGMA journal_mode=WAL')
+        self.database.execute('PRAGMA synchronous=NORMAL')
+        self.database.execute(
+            'CREATE TABLE IF NOT EXISTS hashes ('
+            'device INTEGER, inode INTEGER, size INTEGER, mtime INTEGER, '
+            'hasher INTEGER, hash TEXT NOT NULL, used REAL NOT NULL, '
+            'PRIMARY KEY (device, inode, size, mtime, hasher)'
+            ') WITHOUT ROWID'
+        )
+        self.database.execute(
+            'CREATE INDEX IF NOT EXISTS hashes_used ON hashes (used)'
+        )
+        self.database.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    @staticmethod
+    @ensure_annotations
+    def key(record: FileRecord, hasher: Hasher) -> tuple:
+        """
+        Create a cache key from a file record and hashing algorithm.
+        """
+        return (
+            record.device, record.inode, record.size,
+            record.mtime, hasher.value
+        )
+
+    @ensure_annotations
+    def get(self, record: FileRecord, hasher: Hasher) -> str:
+        """
+        Get a cached hash for a file or an empty string if not present.
+        """
+        key = self.key(record=record, hasher=hasher)
+        row = self.database.execute(
+            'SELECT hash FROM hashes WHERE device = ? AND inode = ? '
+            'AND size = ? AND mtime = ? AND hasher = ?', key
+        ).fetchone()
+
+        if not row:
+            return ''
+
+        self.used.append(key)
+        if len(self.used) >= self.batch:
+            self.flush()
+        return row[0]
+
+    @ensure_annotations
+    def set(self, record: FileRecord, hasher: Hasher, value: str):
+        """
+        Store a hash for a file.
+        """
+        self.inserted.append(
+            self.key(record=record, hasher=hasher) + (value, )
+        )
+        if len(self.inserted) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the pending changes to the database.
+        """
+        now = time()
+        with self.database:
+            self.database.executemany(
+                'INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [item + (now, ) for item in self.inserted]
+            )
+            self.database.executemany(
+                'UPDATE hashes SET used = ? WHERE device = ? AND inode = ? '
+                'AND size = ? AND mtime = ? AND hasher = ?',
+                [(now, ) + item for item in self.used]
+            )
+        self.inserted = []
+        self.used = []
+
+    @ensure_annotations
+    def prune(self, max_age: int = 0, max_entries: int = 0) -> int:
+        """
+        Remove entries not used for more than max_age days and the least
+        recently used entries above the max_entries count, 0=unlimited.
+        Return the number of removed entries.
+        """
+        self.flush()
+        removed = 0
+        with self.database:
+            if max_age:
+                removed += self.database.execute(
+                    'DELETE FROM hashes WHERE used < ?',
+                    (time() - max_age * DAY, )
+                ).rowcount
+            if max_entries:
+                removed += self.database.execute(
+                    'DELETE FROM hashes WHERE '
+                    '(device, inode, size, mtime, hasher) IN ('
+                    'SELECT device, inode, size, mtime, hasher FROM hashes '
+                    'ORDER BY used DESC LIMIT -1 OFFSET ?)', (max_entries, )
+                ).rowcount
+        LOG.info('Pruned %d entries from cache %s', removed, self.path)
+        return removed
+
+    def close(self):
+        """
+        Write the pending changes and close the database.
+        """
+        self.flush()
+        self.database.close()
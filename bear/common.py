@@ -3,10 +3,9 @@ Module for common functions and classes.
 """
 
 import re
-from os import getpid, stat, remove
-from os.path import isfile
+from os import getpid, stat, remove, stat_result, sep
 from enum import Enum
-from typing import Iterable
+from typing import Iterable, NamedTuple
 from ensure import ensure_annotations
 
 
@@ -20,63 +19,169 @@ def ignore_append(ignored: str):
         out.write('\n')
 
 
-@ensure_annotations
-def oversized_file(path: str, limit: int) -> bool:
+class PathFilter:
     """
-    Check if a specified file is within a desired limit in bytes.
+    Exclusion filter compiled once from the --exclude patterns and
+    --exclude-regex regexes, so that each path is matched by at most two
+    searches instead of a search per pattern and regex.
     """
-    result = False
-    if limit and isfile(path):
-        result = stat(path).st_size > limit
-    return result
+    # pylint: disable=too-few-public-methods
 
+    @ensure_annotations
+    def __init__(self, patterns: list, regexes: list):
+        self.patterns = None
+        self.regexes = []
 
-@ensure_annotations
-def pattern_exclude(value: str, patterns: list) -> bool:
+        if patterns:
+            # substrings as a single alternation of escaped literals
+            self.patterns = re.compile(
+                '|'.join(re.escape(exc) for exc in patterns)
+            )
+        if regexes:
+            self.regexes = [re.compile(exc) for exc in regexes]
+            try:
+                # joining renumbers the groups of the backreferences
+                if not any(regex.groups for regex in self.regexes):
+                    self.regexes = [re.compile(
+                        '|'.join(f'(?:{exc})' for exc in regexes)
+                    )]
+            except re.error:
+                # e.g. global inline flags allowed only at the start
+                pass
+
+    def excluded(self, value: str) -> bool:
+        """
+        Exclude (True) a value if it contains any of the patterns
+        or any of the regexes applies.
+        """
+        if self.patterns and self.patterns.search(value):
+            return True
+        return any(regex.search(value) for regex in self.regexes)
+
+    @ensure_annotations
+    def pruned(self, folder: str) -> bool:
+        """
+        Exclude (True) a folder without walking it if the paths of all
+        the files inside are excluded. Only a pattern contained in the
+        folder path is contained in all of them, a regex matching the path
+        of a folder doesn't have to match the longer paths under it (e.g.
+        with "$" or a lookahead), so those are matched per file.
+        """
+        return bool(self.patterns and self.patterns.search(folder + sep))
+
+
+class FileRecord(NamedTuple):
     """
-    Exclude (True) a value if it contains any of the patterns.
+    Compact record of a file with the stat() data collected only once
+    while traversing the folders and reused by all of the following steps.
     """
-    return any([exc in value for exc in patterns])
+    path: str
+    size: int
+    mtime: int
+    inode: int
+    device: int
 
+    @classmethod
+    def from_stat(cls, path: str, info: stat_result):
+        """
+        Create a record from a path and its stat() result.
+        """
+        return cls(
+            path=path, size=info.st_size, mtime=info.st_mtime_ns,
+            inode=info.st_ino, device=info.st_dev
+        )
 
-@ensure_annotations
-def regex_exclude(value: str, regexes: list) -> bool:
+
+def file_path(item) -> str:
+    """
+    Get a path of a file from either a path or a FileRecord.
+    """
+    return item.path if isinstance(item, FileRecord) else item
+
+
+def file_mtime(item):
     """
-    Exclude (True) a value if any of the regex pattern applies.
+    Get a modification time of a file from a FileRecord
+    or stat() if only a path is available.
     """
-    return any([re.search(exc, value) for exc in regexes])
+    return item.mtime if isinstance(item, FileRecord) else stat(item).st_mtime
 
 
 @ensure_annotations
 def remove_except_oldest(files: Iterable):
     """
-    Remove all files from list except the single oldest one.
+    Remove all files (paths or FileRecord objects) from list except
+    the single oldest one.
     """
     # oldest == smallest timestamp
-    without_oldest = sorted(
-        files, key=lambda item: stat(item).st_mtime
-    )[1:]
+    without_oldest = sorted(files, key=file_mtime)[1:]
     for file in without_oldest:
-        remove(file)
+        remove(file_path(file))
 
 
 @ensure_annotations
 def remove_except_newest(files: Iterable):
     """
-    Remove all files from list except the single newest one.
+    Remove all files (paths or FileRecord objects) from list except
+    the single newest one.
     """
     # reverse for oldest
-    without_newest = sorted(
-        files, key=lambda item: stat(item).st_mtime, reverse=True
-    )[1:]
+    without_newest = sorted(files, key=file_mtime, reverse=True)[1:]
     for file in without_newest:
-        remove(file)
+        remove(file_path(file))
+
+
+# difference between the values of the plain and the tree hashers
+TREE_OFFSET = 100
 
 
 class Hasher(Enum):
     """
-    Enum to switch between multiple hashing algorithms.
+    Enum to switch between multiple hashing algorithms, XXH3 (64-bit),
+    XXH128 and BLAKE3 are available only with their optional packages.
+
+    The *_TREE variants are segmented tree digests of the algorithms,
+    kept as separate members so that they never mix with plain digests.
     """
     MD5 = 1
     SHA256 = 2
     BLAKE2 = 3
+    XXH3 = 4
+    XXH128 = 5
+    BLAKE3 = 6
+    MD5_TREE = 101
+    SHA256_TREE = 102
+    BLAKE2_TREE = 103
+    XXH3_TREE = 104
+    XXH128_TREE = 105
+    BLAKE3_TREE = 106
+
+    @property
+    def tree(self) -> bool:
+        """
+        Check if the hasher is a segmented tree digest.
+        """
+        return self.value > TREE_OFFSET
+
+    @property
+    def base(self):
+        """
+        Get the plain algorithm of a hasher.
+        """
+        return Hasher(self.value % TREE_OFFSET)
+
+    def to_tree(self):
+        """
+        Get the segmented tree variant of a hasher.
+        """
+        return Hasher(self.base.value + TREE_OFFSET)
+
+
+class Stage(Enum):
+    """
+    Enum to switch between the hashing stages of finding duplicates,
+    partial stages hash only a block from the start or the end of a file.
+    """
+    HEAD = 1
+    TAIL = 2
+    FULL = 3
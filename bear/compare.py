@@ -0,0 +1,145 @@
+"""
+Module for comparing candidate files block by block.
+"""
+
+import logging
+from argparse import Namespace
+from ensure import ensure_annotations
+
+from bear.common import ignore_append, Hasher
+from bear.context import Context
+from bear.cache import HashCache
+from bear.hashing import (
+    new_hash, file_record, open_checkpoint, BUFFER_SIZE
+)
+from bear.throttle import throttle_read, throttle_open
+
+LOG = logging.getLogger(__name__)
+
+
+def read_block(file, block: int) -> bytes:
+    """
+    Read the next block of an opened file, None if it's not readable.
+    """
+    try:
+        data = file.read(block)
+        throttle_read(len(data))
+        return data
+    except OSError:
+        LOG.critical('Could not read %s! Skipping.', file.name)
+        ignore_append(file.name)
+    return None
+
+
+def split_block(opened: dict, group: list, block: int) -> list:
+    """
+    Read the next block of each of the opened files in a group and split
+    the group into (block, paths) pairs of the files with the same block.
+    """
+    # mostly only a single distinct block, compared instead of hashed
+    blocks = []
+    for path in group:
+        data = read_block(file=opened[path], block=block)
+        if data is None:
+            continue
+        for known, same in blocks:
+            if known == data:
+                same.append(path)
+                break
+        else:
+            blocks.append((data, [path]))
+    return blocks
+
+
+@ensure_annotations
+def compare_files(paths: list, hasher: Hasher,
+                  block: int = BUFFER_SIZE) -> dict:
+    """
+    Read the files of a candidate group block by block in lockstep and
+    split the group as soon as the blocks differ, a file left alone is
+    closed and not read anymore. Return hash + paths of the files with
+    the same contents, which are confirmed byte by byte.
+
+    The hash is computed only once per group of the same blocks and
+    copied when the group splits, so it's the same as hashing the files.
+    """
+    opened = {}
+    for path in paths:
+        throttle_open()
+        try:
+            # pylint: disable=consider-using-with
+            opened[path] = open(path, 'rb')
+        except OSError:
+            LOG.critical('Could not open %s! Skipping.', path)
+            ignore_append(path)
+
+    result = {}
+    # (hash object, paths) of the files with the same blocks so far
+    groups = [(new_hash(hasher=hasher), list(opened))]
+    try:
+        while groups:
+            split = []
+            for digest, group in groups:
+                blocks = split_block(opened=opened, group=group, block=block)
+                for data, same in blocks:
+                    if len(same) < 2:
+                        opened[same[0]].close()
+                    elif not data:
+                        result[digest.hexdigest()] = same
+                    else:
+                        branch = digest.copy() if len(blocks) > 1 else digest
+                        branch.update(data)
+                        split.append((branch, same))
+            groups = split
+    finally:
+        for file in opened.values():
+            file.close()
+    return result
+
+
+def compare_groups(groups: list, hasher: Hasher, master_pid: int = None,
+                   ctx: Context = None, journal: str = '') -> dict:
+    """
+    Compare each of the candidate groups (lists of paths) in the list
+    and return hash + paths of the duplicated files.
+
+    The hashes of the duplicates are complete, so they are stored in the
+    cache and written into the journal the same way as in hash_files().
+    The files split off from a group are not read completely and have
+    no hash to store.
+
+    Note: not decorated with ensure_annotations, so that the function
+          can be pickled for a process Pool the same way as hash_files().
+    """
+    if ctx is None:
+        ctx = Context(Namespace())
+
+    cache = HashCache(ctx.cache) if ctx.cache else None
+    checkpoint = open_checkpoint(
+        journal=journal, hasher=hasher, master_pid=master_pid
+    )
+
+    result = {}
+    try:
+        for group in groups:
+            # stat() before reading to notice changes while comparing
+            records = {
+                path: file_record(path=path) for path in group
+            } if cache or (checkpoint and ctx.resume) else {}
+            compared = compare_files(paths=group, hasher=hasher)
+            for value, paths in compared.items():
+                for path in paths:
+                    record = records.get(path)
+                    if cache and record:
+                        cache.set(record=record, hasher=hasher, value=value)
+                    if checkpoint:
+                        checkpoint.write(
+                            value=value, path=path, record=record
+                        )
+            result.update(compared)
+    finally:
+        if checkpoint:
+            checkpoint.close()
+        if cache:
+            cache.close()
+    return result
@@ -4,7 +4,8 @@ Module for context and configuration grouping.
 
 from argparse import Namespace
 from ensure import ensure_annotations
-from bear.common import Hasher
+from bear.common import Hasher, PathFilter
+from bear.hashers import hash_factory
 
 
 class Context:
@@ -29,13 +30,42 @@ class Context:
     community: bool
     keep_oldest: bool
     keep_newest: bool
+    link: bool
     md5: bool
     blake2: bool
     sha256: bool
+    xxh3: bool
+    xxh128: bool
+    blake3: bool
+    fingerprint: str
+    compare_group: int
+    tree_hash: bool
+    tree_jobs: int
+    prefetch: bool
+    drop_cache: bool
+    direct_io: bool
+    max_read_rate: int
+    max_open_rate: int
+    device_pools: bool
+    rotational_jobs: int
     max_size: int
     load_hashes: bool
     hasher: Hasher
     hashfiles: list
+    head_size: int
+    tail_size: int
+    mmap_size: int
+    cache: str
+    cache_age: int
+    cache_entries: int
+    incremental: str
+    walk_jobs: int
+    backend: str
+    resume: str
+    write_index: str
+    memory_limit: int
+    hardlinks: str
+    path_filter: PathFilter
 
     @ensure_annotations
     def __init__(self, args: Namespace):
@@ -54,13 +84,41 @@ class Context:
             community=False,
             keep_oldest=False,
             keep_newest=False,
+            link=False,
             md5=True,
             blake2=False,
             sha256=False,
+            xxh3=False,
+            xxh128=False,
+            blake3=False,
+            fingerprint='',
+            compare_group=0,
+            tree_hash=False,
+            tree_jobs=0,
+            prefetch=False,
+            drop_cache=False,
+            direct_io=False,
+            max_read_rate=0,
+            max_open_rate=0,
+            device_pools=False,
+            rotational_jobs=2,
             max_size=0,
             load_hashes=False,
             hasher=Hasher.MD5,
-            hashfiles=[]
+            hashfiles=[],
+            head_size=4096,
+            tail_size=4096,
+            mmap_size=0,
+            cache='',
+            cache_age=30,
+            cache_entries=0,
+            incremental='',
+            walk_jobs=1,
+            backend='processes',
+            resume='',
+            write_index='',
+            memory_limit=0,
+            hardlinks=''
         )
 
         for key, value in vars(args).items():
@@ -79,17 +137,32 @@ class Context:
 
         # custom field setters
         self.hasher = self.get_hasher()
+        if self.fingerprint:
+            hash_factory(Hasher[self.fingerprint.upper()])
+        self.path_filter = PathFilter(
+            patterns=self.exclude, regexes=self.exclude_regex
+        )
 
     @ensure_annotations
     def get_hasher(self) -> Hasher:
         """
-        Get non-MD5 hasher if desired.
+        Get non-MD5 hasher if desired, the options are named after
+        the Hasher members, optionally its segmented tree variant.
+        Fails early if the hasher isn't available.
         """
         result = None
-        if self.blake2:
-            result = Hasher.BLAKE2
-        elif self.sha256:
-            result = Hasher.SHA256
-        elif self.md5:
-            result = Hasher.MD5
+        for hasher in Hasher:
+            if hasher.tree or hasher == Hasher.MD5:
+                continue
+            if getattr(self, hasher.name.lower()):
+                result = hasher
+                break
+        else:
+            if self.md5:
+                result = Hasher.MD5
+
+        if result is not None:
+            if self.tree_hash:
+                result = result.to_tree()
+            hash_factory(result)
         return result
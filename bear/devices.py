@@ -0,0 +1,141 @@
+"""
+Module for hashing the files of each device in its own pool.
+"""
+
+import logging
+from collections import deque
+from os import major, minor
+from os.path import join, realpath, dirname
+from ensure import ensure_annotations
+
+from bear.throttle import pool_options
+
+LOG = logging.getLogger(__name__)
+
+# block devices by their major:minor numbers
+SYS_DEV_BLOCK = '/sys/dev/block'
+
+# jobs reading a rotational disk at once, more of them only seek
+ROTATIONAL_JOBS = 2
+
+
+@ensure_annotations
+def is_rotational(device: int) -> bool:
+    """
+    Check whether a device (st_dev) is a rotational disk in the sysfs,
+    partitions have the queue of their disk. Unknown devices (e.g. network
+    filesystems, tmpfs or other platforms) are considered not rotational.
+    """
+    try:
+        folder = realpath(
+            join(SYS_DEV_BLOCK, f'{major(device)}:{minor(device)}')
+        )
+    except (OSError, ValueError):
+        return False
+
+    for parent in (folder, dirname(folder)):
+        try:
+            with open(join(parent, 'queue', 'rotational')) as file:
+                return file.read().strip() == '1'
+        except OSError:
+            continue
+    return False
+
+
+def interleave(iterators: list):
+    """
+    Yield the items of the iterators in turns, one of each, until all
+    of them are exhausted.
+    """
+    pending = deque(iterators)
+    while pending:
+        iterator = pending.popleft()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            continue
+        yield item
+        pending.append(iterator)
+
+
+class DevicePools:
+    """
+    Pools of hashing workers, one per device, so that the files of a slow
+    rotational disk are read by only a few workers at once while the other
+    devices are read concurrently by their own workers. The pools are
+    created when a device is hashed for the first time.
+
+    The files are split by the device of their FileRecord, a list of paths
+    (e.g. a group of compared files) goes to the device of its first path.
+    """
+
+    @ensure_annotations
+    def __init__(self, pool_class, records: dict, jobs: int,
+                 rotational_jobs: int = ROTATIONAL_JOBS):
+        self.pool_class = pool_class
+        self.records = records
+        self.jobs = jobs
+        self.rotational_jobs = rotational_jobs
+        self.pools = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.terminate()
+
+    @ensure_annotations
+    def processes(self, device: int) -> int:
+        """
+        Get how many workers hash the files of a device.
+        """
+        if is_rotational(device):
+            return max(min(self.jobs, self.rotational_jobs), 1)
+        return self.jobs
+
+    @ensure_annotations
+    def pool(self, device: int):
+        """
+        Get the pool of a device, create it if there's none yet.
+        """
+        if device not in self.pools:
+            processes = self.processes(device)
+            LOG.info('Hashing device %d with %d jobs', device, processes)
+            self.pools[device] = self.pool_class(
+                processes=processes, **pool_options()
+            )
+        return self.pools[device]
+
+    @ensure_annotations
+    def split(self, files: list) -> dict:
+        """
+        Split (size, path) pairs by the device of the paths.
+        """
+        devices = {}
+        for size, path in files:
+            first = path[0] if isinstance(path, list) else path
+            record = self.records.get(first)
+            device = record.device if record else 0
+            devices.setdefault(device, []).append((size, path))
+        return devices
+
+    def imap(self, func, batches: dict):
+        """
+        Map device + batches to the pools of the devices, all of the
+        devices at once, and return an iterator of the results taking
+        one from each device in turns, in the order of the devices.
+        """
+        # imap() only queues the batches, the pools work concurrently
+        # while the results are collected from all of them
+        return interleave([
+            self.pool(device).imap(func, batches[device])
+            for device in sorted(batches)
+        ])
+
+    def terminate(self):
+        """
+        Stop the workers of all the pools.
+        """
+        while self.pools:
+            _, pool = self.pools.popitem()
+            pool.terminate()
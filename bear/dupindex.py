@@ -0,0 +1,121 @@
+"""
+Module for the compact in-memory index of hashed files.
+"""
+
+from os import fsencode, fsdecode
+from os.path import split, join
+from array import array
+from itertools import groupby
+from ensure import ensure_annotations
+
+
+class DuplicateIndex:
+    """
+    Compact index of hash + path values of hashed files, the digests
+    are stored as raw bytes in a single bytearray, the paths as an id
+    of the interned parent folder and the encoded file name in a single
+    bytearray, so a file costs only a few tens of bytes instead of
+    the hex string, the path string and the list slots.
+
+    The hex hashes and the full paths are created only for duplicates
+    when iterating over them. Hashes not in the hex format of the digest
+    size (e.g. from hand-edited hashfiles) are kept as they are.
+    """
+    __slots__ = (
+        'digest_size', 'digests', 'folders', 'parents', 'names', 'offsets',
+        'other'
+    )
+
+    @ensure_annotations
+    def __init__(self, digest_size: int):
+        self.digest_size = digest_size
+        self.digests = bytearray()
+        # folder + id, the ids are in the insertion order
+        self.folders = {}
+        self.parents = array('I')
+        self.names = bytearray()
+        self.offsets = array('Q', [0])
+        self.other = {}
+
+    def __len__(self):
+        return len(self.parents) + sum(
+            len(paths) for paths in self.other.values()
+        )
+
+    @ensure_annotations
+    def add(self, value: str, path: str):
+        """
+        Add a hash of a file.
+        """
+        try:
+            digest = bytes.fromhex(value)
+        except ValueError:
+            digest = b''
+        if len(digest) != self.digest_size:
+            self.other.setdefault(value, []).append(path)
+            return
+
+        folder, name = split(path)
+        self.digests += digest
+        self.parents.append(self.folders.setdefault(folder, len(self.folders)))
+        self.names += fsencode(name)
+        self.offsets.append(len(self.names))
+
+    @ensure_annotations
+    def update(self, hashes: dict):
+        """
+        Add hash + paths values.
+        """
+        for value, paths in hashes.items():
+            for path in paths:
+                self.add(value=value, path=path)
+
+    def digest(self, idx: int) -> bytes:
+        """
+        Get the raw digest of a file.
+        """
+        start = idx * self.digest_size
+        return bytes(self.digests[start:start + self.digest_size])
+
+    def path(self, idx: int, folders: list) -> str:
+        """
+        Get the full path of a file from the list of the interned folders.
+        """
+        return join(folders[self.parents[idx]], fsdecode(bytes(
+            self.names[self.offsets[idx]:self.offsets[idx + 1]]
+        )))
+
+    def buckets(self) -> list:
+        """
+        Split the files into arrays of indexes by the first byte of their
+        digests, in the order of the files.
+        """
+        result = [array('I') for _ in range(256)]
+        for idx, first in enumerate(self.digests[::self.digest_size]):
+            result[first].append(idx)
+        return result
+
+    def items(self):
+        """
+        Iterate over hash + paths of the duplicated files in the order
+        of the digests, the files with the same hash keep their order.
+
+        The files are sorted one bucket of the first digest byte at once,
+        so that only the sort keys of a 1/256 of the files exist at once
+        besides a compact array of the indexes of all of them.
+        """
+        folders = list(self.folders)
+        for bucket in self.buckets():
+            order = sorted(bucket, key=self.digest)
+            for digest, run in groupby(order, key=self.digest):
+                run = list(run)
+                if len(run) > 1:
+                    yield digest.hex(), [
+                        self.path(idx=idx, folders=folders) for idx in run
+                    ]
+            # release the bucket as soon as it's listed
+            del bucket[:]
+
+        for value, paths in self.other.items():
+            if len(paths) > 1:
+                yield value, paths
@@ -0,0 +1,172 @@
+"""
+Module for finding duplicates in hashfiles and converting them into
+binary indexes with an external merge sort.
+"""
+
+import logging
+from os import remove
+from os.path import join
+from tempfile import mkdtemp
+from shutil import rmtree
+from heapq import merge
+from itertools import groupby
+from operator import itemgetter
+from ensure import ensure_annotations
+
+from bear.journal import parse_line
+from bear.binindex import HashIndex, is_index, write_sorted_index
+
+LOG = logging.getLogger(__name__)
+
+# approximate memory of a (hash, path) tuple in a list without the strings
+ENTRY_OVERHEAD = 160
+# spill files merged at once, each of them is an open file
+MAX_SPILLS = 128
+# memory for sorting hashfiles into an index without a memory limit
+INDEX_MEMORY = 256 * 1024 ** 2
+
+
+def read_entries(hashfiles: list):
+    """
+    Iterate over (hash, path) entries from text hashfiles and binary
+    indexes line by line.
+    """
+    for hashfile in hashfiles:
+        if is_index(hashfile):
+            with HashIndex(hashfile) as index:
+                for digest, idx in index.digests():
+                    yield digest.hex(), index.entry_path(idx)
+            continue
+
+        with open(hashfile) as file:
+            for line in file:
+                value, path, _, _ = parse_line(line)
+                yield value, path.strip()
+
+
+def read_spill(path: str):
+    """
+    Iterate over (hash, path) entries of a spill file.
+    """
+    with open(path) as file:
+        for line in file:
+            value, name = line.rstrip('\n').split('\t', 1)
+            yield value, name
+
+
+@ensure_annotations
+def write_spill(entries, path: str) -> str:
+    """
+    Write sorted (hash, path) entries into a spill file.
+    """
+    with open(path, 'w') as file:
+        for value, name in entries:
+            file.write(f'{value}\t{name}\n')
+    return path
+
+
+@ensure_annotations
+def merge_spills(spills: list, path: str) -> str:
+    """
+    Merge sorted spill files into a single one and remove them.
+    """
+    write_spill(merge(
+        *[read_spill(spill) for spill in spills], key=itemgetter(0)
+    ), path)
+    for spill in spills:
+        remove(spill)
+    return path
+
+
+@ensure_annotations
+def sort_entries(entries, memory_limit: int, folder: str):
+    """
+    Sort (hash, path) entries by hash keeping about memory_limit bytes
+    of them in memory, the sorted chunks above the limit are spilled
+    into files in the folder and merged back while iterating.
+
+    Both the sort and the merge are stable, the entries with the same
+    hash keep their order.
+    """
+    chunk = []
+    used = 0
+    spills = []
+    count = 0
+    for entry in entries:
+        chunk.append(entry)
+        used += len(entry[0]) + len(entry[1]) + ENTRY_OVERHEAD
+        if used < memory_limit:
+            continue
+
+        chunk.sort(key=itemgetter(0))
+        count += 1
+        spills.append(write_spill(chunk, join(folder, f'{count}.txt')))
+        chunk = []
+        used = 0
+        if len(spills) >= MAX_SPILLS:
+            count += 1
+            spills = [merge_spills(spills, join(folder, f'{count}.txt'))]
+
+    LOG.debug('Sorted %d spill files', count)
+    chunk.sort(key=itemgetter(0))
+    return merge(
+        *[read_spill(spill) for spill in spills], chunk, key=itemgetter(0)
+    )
+
+
+@ensure_annotations
+def stream_duplicates(hashfiles: list, memory_limit: int):
+    """
+    Find duplicates from hashfiles with bounded memory, iterate over
+    hash + paths of the duplicated files in the order of hashes.
+    """
+    folder = mkdtemp(prefix='bear_sort_')
+    try:
+        entries = sort_entries(
+            read_entries(hashfiles), memory_limit=memory_limit, folder=folder
+        )
+        for value, run in groupby(entries, key=itemgetter(0)):
+            paths = [path for _, path in run]
+            if len(paths) > 1:
+                yield value, paths
+    finally:
+        rmtree(folder, ignore_errors=True)
+
+
+def read_sized_entries(hashfiles: list):
+    """
+    Iterate over (hash, size + path) entries from text hashfiles, the size
+    is kept in front of the path so that it passes through the spills.
+    """
+    for hashfile in hashfiles:
+        with open(hashfile) as file:
+            for line in file:
+                value, path, size, _ = parse_line(line)
+                yield value.lower(), f'{size}\t{path.strip()}'
+
+
+def unpack_sized(entries):
+    """
+    Iterate over (hash, path, size) entries from (hash, size + path) ones.
+    """
+    for value, sized in entries:
+        size, path = sized.split('\t', 1)
+        yield value, path, int(size)
+
+
+@ensure_annotations
+def convert_hashfiles(hashfiles: list, out: str, memory_limit: int = 0):
+    """
+    Convert text hashfiles with hash + path (+ size + mtime) lines
+    into a binary index sorting them with at most about memory_limit
+    bytes (INDEX_MEMORY if 0) of entries in memory.
+    """
+    folder = mkdtemp(prefix='bear_sort_')
+    try:
+        entries = sort_entries(
+            read_sized_entries(hashfiles),
+            memory_limit=memory_limit or INDEX_MEMORY, folder=folder
+        )
+        write_sorted_index(entries=unpack_sized(entries), out=out)
+    finally:
+        rmtree(folder, ignore_errors=True)
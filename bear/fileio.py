@@ -0,0 +1,64 @@
+"""
+Module for opening the hashed files and advising the kernel about them.
+"""
+
+from os import open as os_open, close, O_RDONLY
+from ensure import ensure_annotations
+
+from bear.throttle import throttle_open
+
+try:
+    # pylint: disable=unused-import
+    from os import (
+        posix_fadvise, POSIX_FADV_WILLNEED, POSIX_FADV_SEQUENTIAL,
+        POSIX_FADV_DONTNEED
+    )
+except ImportError:
+    # not available on Windows and macOS
+    posix_fadvise = None
+    POSIX_FADV_WILLNEED = POSIX_FADV_SEQUENTIAL = POSIX_FADV_DONTNEED = 0
+
+try:
+    from os import O_DIRECT
+except ImportError:
+    # only on Linux and some BSDs
+    O_DIRECT = 0
+
+
+def advise(file, advice: int, offset: int = 0, length: int = 0):
+    """
+    Advise the kernel how a block of an opened file is going to be used
+    (0 length for all of the file), no-op if it's not supported.
+    """
+    if not posix_fadvise:
+        return
+    try:
+        posix_fadvise(file.fileno(), offset, length, advice)
+    except OSError:
+        pass
+
+
+@ensure_annotations
+def open_file(path: str, direct: bool = False):
+    """
+    Open a file for reading as a binary file object, optionally with
+    O_DIRECT bypassing the page cache if the filesystem supports it.
+
+    Direct reads need buffers, offsets and sizes aligned to the block
+    size of the device, e.g. memory-mapped buffers of a MiB.
+    """
+    throttle_open()
+    if direct and O_DIRECT:
+        try:
+            descriptor = os_open(path, O_RDONLY | O_DIRECT)
+        except OSError:
+            # e.g. tmpfs, the error of a missing file comes from open()
+            descriptor = None
+        if descriptor is not None:
+            try:
+                return open(descriptor, 'rb', buffering=0)
+            except OSError:
+                close(descriptor)
+                raise
+    # pylint: disable=consider-using-with
+    return open(path, 'rb')
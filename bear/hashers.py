@@ -0,0 +1,131 @@
+"""
+Module for the registry of the available hashing algorithms.
+"""
+
+from hashlib import md5, sha256, blake2b
+from functools import partial
+from ensure import ensure_annotations
+
+from bear.common import Hasher
+
+# constructors of hash objects resolved only once on import
+HASHERS = {
+    Hasher.MD5: md5,
+    Hasher.SHA256: sha256,
+    Hasher.BLAKE2: blake2b
+}
+
+# optional packages providing the fast algorithms
+EXTRAS = {
+    Hasher.XXH3: 'xxhash',
+    Hasher.XXH128: 'xxhash',
+    Hasher.BLAKE3: 'blake3'
+}
+
+try:
+    import xxhash
+    HASHERS[Hasher.XXH3] = xxhash.xxh3_64
+    HASHERS[Hasher.XXH128] = xxhash.xxh3_128
+except ImportError:
+    pass
+
+try:
+    from blake3 import blake3
+    HASHERS[Hasher.BLAKE3] = blake3
+except ImportError:
+    pass
+
+
+@ensure_annotations
+def register_hasher(hasher: Hasher, factory):
+    """
+    Register a constructor of empty hash objects for an algorithm,
+    the objects need update(), hexdigest() and digest_size.
+    """
+    HASHERS[hasher] = factory
+
+
+@ensure_annotations
+def hash_factory(hasher: Hasher):
+    """
+    Get a constructor of empty hash objects for an algorithm.
+    """
+    factory = HASHERS.get(hasher.base)
+    if factory is None:
+        raise ValueError(
+            f'{hasher.name} hashing requires {EXTRAS.get(hasher.base)}'
+            f' package, install it or use "pip install thebear[fast]"'
+        )
+    if hasher.tree:
+        factory = partial(TreeHash, factory=factory)
+    return factory
+
+
+class TreeHash:
+    """
+    Hash object of a segmented tree digest, the data is split into
+    segments of a fixed size, each of them is hashed separately and
+    the root digest is the hash of the concatenated segment digests.
+
+    The segments of a file can be hashed concurrently and combined
+    into the same digest, the object itself hashes them in order.
+    """
+    # changing the size changes all of the digests
+    segment: int = 16 * 1024 * 1024
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.current = factory()
+        self.filled = 0
+        self.leaves = []
+        self.digest_size = self.current.digest_size
+
+    def update(self, data):
+        """
+        Hash more data, splitting it on the segment boundaries.
+        """
+        view = memoryview(data)
+        while len(view):
+            take = min(len(view), self.segment - self.filled)
+            self.current.update(view[:take])
+            self.filled += take
+            view = view[take:]
+            if self.filled == self.segment:
+                self.leaves.append(self.current.digest())
+                self.current = self.factory()
+                self.filled = 0
+
+    def copy(self):
+        """
+        Create a copy of the hash object with the same state.
+        """
+        result = TreeHash(factory=self.factory)
+        result.current = self.current.copy()
+        result.filled = self.filled
+        result.leaves = list(self.leaves)
+        return result
+
+    def digest(self) -> bytes:
+        """
+        Get the root digest of the segment digests.
+        """
+        leaves = self.leaves
+        if self.filled:
+            leaves = leaves + [self.current.digest()]
+        return combine_leaves(factory=self.factory, leaves=leaves)
+
+    def hexdigest(self) -> str:
+        """
+        Get the root digest as a hex string.
+        """
+        return self.digest().hex()
+
+
+def combine_leaves(factory, leaves) -> bytes:
+    """
+    Hash the digests of the segments into the root digest.
+    """
+    root = factory()
+    for leaf in leaves:
+        root.update(leaf)
+    return root.digest()
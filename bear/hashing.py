@@ -4,12 +4,43 @@ Module for hashing-related functions.
 
 import logging
 import traceback
-from os import getpid
+from argparse import Namespace
+from os import getpid, fstat, stat, cpu_count, SEEK_END
+from os.path import join
+from mmap import mmap, ACCESS_READ
+from threading import local, get_ident
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, wait
 from ensure import ensure_annotations
 
-from bear.common import ignore_append, Hasher
+from bear.common import ignore_append, Hasher, Stage, FileRecord
+from bear.context import Context
+from bear.cache import HashCache
+from bear.journal import Journal, journal_name
+from bear.hashers import hash_factory, TreeHash, combine_leaves
+from bear.prefetch import Prefetcher
+from bear.throttle import throttle_read, throttle_open
+from bear.fileio import (
+    open_file, advise, POSIX_FADV_SEQUENTIAL, POSIX_FADV_DONTNEED
+)
+
+try:
+    from os import pread  # pylint: disable=ungrouped-imports
+except ImportError:
+    # not available on Windows, tree digests are hashed sequentially
+    pread = None
 
 LOG = logging.getLogger(__name__)
+BUFFER_SIZE = 1024 * 1024
+BUFFERS = local()
+
+
+@ensure_annotations
+def new_hash(hasher: Hasher):
+    """
+    Create an empty hash object for the desired algorithm.
+    """
+    return hash_factory(hasher)()
 
 
 @ensure_annotations
@@ -17,29 +48,198 @@ def hash_text(inp: bytes, hasher: Hasher) -> str:
     """
     Hash simple string of text.
     """
-    result = None
-    if hasher == Hasher.MD5:
-        from hashlib import md5
-        result = md5(inp).hexdigest()
-    elif hasher == Hasher.SHA256:
-        from hashlib import sha256
-        result = sha256(inp).hexdigest()
-    elif hasher == Hasher.BLAKE2:
-        from hashlib import blake2b
-        result = blake2b(inp).hexdigest()
-    return result
+    result = new_hash(hasher=hasher)
+    result.update(inp)
+    return result.hexdigest()
 
 
 @ensure_annotations
-def hash_file(path: str, hasher: Hasher) -> str:
+def get_buffer(name: str = 'buffer') -> memoryview:
+    """
+    Get a read buffer allocated only once per worker and reused
+    for all of the files hashed by that worker, the named ones are
+    additional buffers, e.g. for reading ahead.
+
+    The buffers are anonymous memory maps aligned to the memory pages,
+    so that they can be used for direct reads too.
+    """
+    buffer = getattr(BUFFERS, name, None)
+    if buffer is None:
+        buffer = memoryview(mmap(-1, BUFFER_SIZE))
+        setattr(BUFFERS, name, buffer)
+    return buffer
+
+
+def limit_buffer(buffer: memoryview, remaining: int) -> memoryview:
+    """
+    Limit a buffer to the remaining bytes to read, negative for all.
     """
-    Open a file, read its contents and return MD5 hash.
+    if 0 < remaining < len(buffer):
+        return buffer[:remaining]
+    return buffer
+
+
+def hash_stream(file, digest, size: int = -1):
+    """
+    Update a hash object with the contents of an opened binary file
+    read into a fixed buffer, optionally only up to a size in bytes.
+    """
+    buffer = get_buffer()
+    remaining = size
+    while remaining:
+        view = limit_buffer(buffer=buffer, remaining=remaining)
+
+        read = file.readinto(view)
+        if not read:
+            break
+        throttle_read(read)
+        digest.update(view[:read])
+
+        if remaining > 0:
+            remaining -= read
+
+
+def hash_mapped(mapped: mmap, digest):
+    """
+    Update a hash object with the contents of a memory-mapped file without
+    copying them, in blocks of the buffer size to limit the read rate.
+    """
+    with memoryview(mapped) as view:
+        for start in range(0, len(view), BUFFER_SIZE):
+            with view[start:start + BUFFER_SIZE] as block:
+                throttle_read(len(block))
+                digest.update(block)
+
+
+def hash_ahead(file, digest, reader: Prefetcher, size: int = -1):
     """
+    Update a hash object the same way as hash_stream(), but the next
+    block is read into the other of two buffers by the reader's thread
+    while the current one is hashed.
+    """
+    buffers = [get_buffer(), get_buffer(name='ahead')]
+    current = 0
+    remaining = size
+    pending = reader.read(file, limit_buffer(
+        buffer=buffers[current], remaining=remaining
+    ))
+    try:
+        while pending:
+            read = pending.result()
+            pending = None
+            if not read:
+                break
+            throttle_read(read)
+            view = buffers[current][:read]
+            if remaining > 0:
+                remaining -= read
+
+            current = 1 - current
+            if remaining:
+                pending = reader.read(file, limit_buffer(
+                    buffer=buffers[current], remaining=remaining
+                ))
+            digest.update(view)
+    finally:
+        # don't leave the buffer filled by the thread after returning
+        if pending:
+            wait([pending])
+
+
+def hash_segment(fileno: int, factory, start: int, size: int) -> bytes:
+    """
+    Hash a segment of an opened file read by pread() from its offset,
+    so that multiple threads can read segments of the same file.
+    """
+    digest = factory()
+    end = start + size
+    while start < end:
+        data = pread(fileno, min(BUFFER_SIZE, end - start), start)
+        if not data:
+            break
+        throttle_read(len(data))
+        digest.update(data)
+        start += len(data)
+    return digest.digest()
+
+
+@ensure_annotations
+def tree_threads(ctx: Context) -> int:
+    """
+    Get how many threads hash the segments of a file, by default
+    the cores are split between the hashing jobs.
+    """
+    if ctx.tree_jobs:
+        return ctx.tree_jobs
+    cores = cpu_count() or 1
+    return max(cores // (ctx.jobs or cores), 1)
+
+
+@ensure_annotations
+def hash_tree(fileno: int, size: int, hasher: Hasher, jobs: int = 1) -> str:
+    """
+    Hash the segments of an opened file concurrently in at most jobs
+    threads and combine them into the same root digest as TreeHash does.
+    """
+    factory = hash_factory(hasher.base)
+    segments = range(0, size, TreeHash.segment)
+    with ThreadPoolExecutor(
+            max_workers=max(min(len(segments), jobs), 1)
+    ) as executor:
+        leaves = executor.map(partial(
+            hash_segment, fileno, factory, size=TreeHash.segment
+        ), segments)
+        return combine_leaves(factory=factory, leaves=leaves).hex()
+
+
+@ensure_annotations
+def hash_file(path: str, hasher: Hasher, offset: int = 0,
+              size: int = -1, mmap_size: int = 0, reader=None,
+              drop_cache: bool = False, direct: bool = False,
+              tree_jobs: int = 1) -> str:
+    """
+    Open a file, read its contents (or only a block of size bytes from
+    the offset, negative from the end) and return its hash. The other
+    parameters select how the file is read, memory-mapped above mmap_size,
+    with a Prefetcher reader, without caching or in tree_jobs threads.
+    """
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    # pylint: disable=too-many-locals
     result = ''
+    whole = not offset and size < 0
     try:
-        with open(path, 'rb') as file:
-            contents = file.read()
-        result = hash_text(inp=contents, hasher=hasher)
+        file = reader.take(path) if reader else None
+        with file or open_file(path=path, direct=direct and whole) as file:
+            digest = new_hash(hasher=hasher)
+            file_size = fstat(file.fileno()).st_size if whole else 0
+            if whole:
+                advise(file=file, advice=POSIX_FADV_SEQUENTIAL)
+
+            parallel = hasher.tree and pread and not direct
+            if parallel and file_size > TreeHash.segment:
+                result = hash_tree(
+                    fileno=file.fileno(), size=file_size, hasher=hasher,
+                    jobs=tree_jobs
+                )
+            elif whole and not direct and 0 < mmap_size <= file_size:
+                with mmap(file.fileno(), 0, access=ACCESS_READ) as mapped:
+                    hash_mapped(mapped=mapped, digest=digest)
+                result = digest.hexdigest()
+            else:
+                if offset < 0:
+                    file.seek(offset, SEEK_END)
+                elif offset:
+                    file.seek(offset)
+                if reader:
+                    hash_ahead(
+                        file=file, digest=digest, reader=reader, size=size
+                    )
+                else:
+                    hash_stream(file=file, digest=digest, size=size)
+                result = digest.hexdigest()
+
+            if drop_cache:
+                advise(file=file, advice=POSIX_FADV_DONTNEED)
     except PermissionError:
         LOG.critical(
             'Could not open %s due to permission error! %s',
@@ -55,45 +255,189 @@ def hash_file(path: str, hasher: Hasher) -> str:
     return result
 
 
-def hash_files(files: list, hasher: Hasher, master_pid: int = None) -> dict:
+def file_record(path: str) -> FileRecord:
+    """
+    Create a FileRecord of a file or None if the file can't be stat'ed.
     """
-    Hash each of the file in the list.
+    throttle_open()
+    try:
+        return FileRecord.from_stat(path=path, info=stat(path))
+    except OSError:
+        return None
+
+
+@ensure_annotations
+def hash_file_cached(path: str, hasher: Hasher, cache: HashCache,
+                     mmap_size: int = 0, **kwargs) -> str:
+    """
+    Get a file hash from the cache or hash the file and cache the result.
+    """
+    record = file_record(path=path)
+    if not record:
+        # let the hashing report the error
+        return hash_file(
+            path=path, hasher=hasher, mmap_size=mmap_size, **kwargs
+        )
+
+    result = cache.get(record=record, hasher=hasher)
+    if not result:
+        result = hash_file(
+            path=path, hasher=hasher, mmap_size=mmap_size, **kwargs
+        )
+        if result:
+            cache.set(record=record, hasher=hasher, value=result)
+    return result
 
-    In case of a MemoryError (limitation of e.g. 32-bit Python)
-    write out the file names in separate .txt files per PID
-    of the process used for hashing.
 
-    Note: master_pid should have a default in case of running out of MP,
-          and use master's PID so that master can recognize slave processes'
-          files after the slaves in the Pool are terminated.
+def read_options(hasher: Hasher, stage: Stage, ctx: Context,
+                 reader=None) -> dict:
     """
+    Get the keyword arguments of hash_file() for reading the files,
+    only the options set are passed.
+    """
+    result = {}
+    if reader:
+        result['reader'] = reader
+    if ctx.drop_cache:
+        result['drop_cache'] = True
+    if ctx.direct_io and stage == Stage.FULL:
+        result['direct'] = True
+    if hasher.tree and stage == Stage.FULL:
+        result['tree_jobs'] = tree_threads(ctx=ctx)
+    return result
+
+
+def hash_stage(path: str, hasher: Hasher, stage: Stage, ctx: Context,
+               cache: HashCache = None, reader: Prefetcher = None) -> str:
+    """
+    Hash the part of a file belonging to a hashing stage.
+    """
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    kwargs = read_options(
+        hasher=hasher, stage=stage, ctx=ctx, reader=reader
+    )
+    if stage == Stage.HEAD:
+        result = hash_file(
+            path=path, hasher=hasher, size=ctx.head_size, **kwargs
+        )
+    elif stage == Stage.TAIL:
+        result = hash_file(
+            path=path, hasher=hasher,
+            offset=-ctx.tail_size, size=ctx.tail_size, **kwargs
+        )
+    elif cache:
+        result = hash_file_cached(
+            path=path, hasher=hasher, cache=cache, mmap_size=ctx.mmap_size,
+            **kwargs
+        )
+    else:
+        result = hash_file(
+            path=path, hasher=hasher, mmap_size=ctx.mmap_size, **kwargs
+        )
+    return result
+
+
+@ensure_annotations
+def stage_block(stage: Stage, ctx: Context) -> tuple:
+    """
+    Get the (offset, length) block of files read in a hashing stage,
+    negative offset is counted from the end and 0 length means all.
+    """
+    if stage == Stage.HEAD:
+        return 0, ctx.head_size
+    if stage == Stage.TAIL:
+        return -ctx.tail_size, ctx.tail_size
+    return 0, 0
+
+
+@ensure_annotations
+def open_reader(files: list, stage: Stage, ctx: Context):
+    """
+    Create a Prefetcher of the files hashed in a stage if reading ahead
+    is enabled, otherwise None.
+    """
+    if not ctx.prefetch:
+        return None
+    offset, length = stage_block(stage=stage, ctx=ctx)
+    return Prefetcher(
+        paths=files, offset=offset, length=length,
+        direct=ctx.direct_io and stage == Stage.FULL
+    )
+
+
+def open_checkpoint(journal: str, hasher: Hasher, master_pid=None):
+    """
+    Open the Journal file of the current process and thread in a journal
+    folder, None without a folder.
+    """
+    if not journal:
+        return None
+    return Journal(join(journal, journal_name(
+        master_pid=master_pid or getpid(), pid=getpid(),
+        thread=get_ident(), hasher=hasher
+    )))
+
+
+def hash_files(files: list, hasher: Hasher, master_pid: int = None,
+               stage: Stage = Stage.FULL, ctx: Context = None,
+               sink=None, journal: str = '') -> dict:
+    """
+    Hash each of the file in the list (only its head or tail block for
+    partial stages) and return hash + paths, or add them into the sink.
+    Complete hashes are written into a journal file per master_pid and
+    process in the journal folder.
+    """
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+
+    if ctx is None:
+        ctx = Context(Namespace())
 
     hashfiles = {}
-    files_len = len(files)
-    partial_file = f"bear_m{master_pid}_s{getpid()}_hashes.txt"
-
-    # safe-check in case the name changes in the future to prevent
-    # creating files that won't be deleted by master process
-    assert f"bear_m{master_pid}_" in partial_file
-    assert f"_hashes.txt" in partial_file
-
-    for idx, fname in enumerate(files):
-        LOG.debug('Hashing %d / %d', idx + 1, files_len)
-
-        try:
-            fhash = hash_file(path=fname, hasher=hasher)
-            if not fhash:
-                continue
-            with open(partial_file, "a") as file:
-                file.write(f"{fhash}\t{fname}\n")
-            if fhash not in hashfiles:
-                hashfiles[fhash] = [fname]
-            else:
-                hashfiles[fhash].extend([fname])
-        except MemoryError:
-            LOG.critical(
-                'Not enough memory while hashing %s, skipping.', fname
-            )
-            ignore_append(fname)
 
+    cache = None
+    if ctx.cache and stage == Stage.FULL:
+        cache = HashCache(ctx.cache)
+
+    reader = open_reader(files=files, stage=stage, ctx=ctx)
+
+    # partial hashes are valid only within the current stage
+    checkpoint = open_checkpoint(
+        journal=journal if stage == Stage.FULL else '', hasher=hasher,
+        master_pid=master_pid
+    )
+
+    try:
+        for idx, fname in enumerate(files):
+            LOG.debug('Hashing %d / %d (%s)', idx + 1, len(files), stage.name)
+
+            try:
+                # stat() before reading to notice changes while hashing,
+                # only --resume reads the size and mtime columns
+                record = file_record(path=fname) if (
+                    checkpoint and ctx.resume
+                ) else None
+                fhash = hash_stage(
+                    path=fname, hasher=hasher, stage=stage,
+                    ctx=ctx, cache=cache, reader=reader
+                )
+                if not fhash:
+                    continue
+                if checkpoint:
+                    checkpoint.write(value=fhash, path=fname, record=record)
+                if sink is not None:
+                    sink.add(value=fhash, path=fname)
+                else:
+                    hashfiles.setdefault(fhash, []).append(fname)
+            except MemoryError:
+                LOG.critical(
+                    'Not enough memory while hashing %s, skipping.', fname
+                )
+                ignore_append(fname)
+    finally:
+        if reader:
+            reader.close()
+        if checkpoint:
+            checkpoint.close()
+        if cache:
+            cache.close()
     return hashfiles
@@ -0,0 +1,152 @@
+"""
+Module for the index of a previous scan used for incremental rescans.
+"""
+
+import logging
+import sqlite3
+from os import sep
+from threading import RLock
+from ensure import ensure_annotations
+
+from bear.common import Hasher, FileRecord
+
+LOG = logging.getLogger(__name__)
+
+# separator of the names stored in a single column,
+# the only character not allowed in a path
+NAMES_SEP = '\0'
+
+
+class ScanIndex:
+    """
+    Persistent SQLite index of a previous scan storing folder listings
+    with the folder modification time and the hashes of the files with
+    the stat() data they were hashed with.
+
+    All the changes are written in a single transaction when closing.
+    The index can be shared by the threads of a parallel traversal.
+    """
+
+    @ensure_annotations
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = RLock()
+        self.database = sqlite3.connect(path, check_same_thread=False)
+        self.database.execute(
+            'CREATE TABLE IF NOT EXISTS folders ('
+            'path TEXT PRIMARY KEY, mtime INTEGER NOT NULL, '
+            'files TEXT NOT NULL, folders TEXT NOT NULL'
+            ')'
+        )
+        self.database.execute(
+            'CREATE TABLE IF NOT EXISTS files ('
+            'path TEXT, hasher INTEGER, size INTEGER NOT NULL, '
+            'mtime INTEGER NOT NULL, device INTEGER NOT NULL, '
+            'inode INTEGER NOT NULL, hash TEXT NOT NULL, '
+            'PRIMARY KEY (path, hasher)'
+            ')'
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    @ensure_annotations
+    def get_folder(self, path: str, mtime: int) -> tuple:
+        """
+        Get the (files, folders) names of an unchanged folder listing
+        or an empty tuple if the folder was modified since the last scan.
+        """
+        with self.lock:
+            row = self.database.execute(
+                'SELECT files, folders FROM folders '
+                'WHERE path = ? AND mtime = ?', (path, mtime)
+            ).fetchone()
+        if not row:
+            return ()
+        return tuple(
+            [name for name in names.split(NAMES_SEP) if name]
+            for names in row
+        )
+
+    @ensure_annotations
+    def set_folder(self, path: str, mtime: int, files: list, folders: list):
+        """
+        Store a folder listing and forget the files and folders removed
+        from it since the last scan.
+        """
+        with self.lock:
+            row = self.database.execute(
+                'SELECT files, folders FROM folders WHERE path = ?', (path, )
+            ).fetchone()
+            if row:
+                old_files, old_folders = [
+                    set(names.split(NAMES_SEP)) - {''} for names in row
+                ]
+                self.database.executemany(
+                    'DELETE FROM files WHERE path = ?', [
+                        (f'{path}{sep}{name}', )
+                        for name in old_files - set(files)
+                    ]
+                )
+                for name in old_folders - set(folders):
+                    self.forget_folder(f'{path}{sep}{name}')
+
+            self.database.execute(
+                'INSERT OR REPLACE INTO folders VALUES (?, ?, ?, ?)', (
+                    path, mtime,
+                    NAMES_SEP.join(files), NAMES_SEP.join(folders)
+                )
+            )
+
+    @ensure_annotations
+    def forget_folder(self, path: str):
+        """
+        Remove a folder and everything below it from the index.
+        """
+        # all paths prefixed with "<path><sep>" sort within this range
+        start = f'{path}{sep}'
+        end = f'{path}{chr(ord(sep) + 1)}'
+        with self.lock:
+            for table in ('folders', 'files'):
+                self.database.execute(
+                    f'DELETE FROM {table} WHERE path = ? '
+                    'OR (path >= ? AND path < ?)', (path, start, end)
+                )
+
+    @ensure_annotations
+    def get(self, record: FileRecord, hasher: Hasher) -> str:
+        """
+        Get the hash of an unchanged file or an empty string.
+        """
+        with self.lock:
+            row = self.database.execute(
+                'SELECT hash FROM files WHERE path = ? AND hasher = ? '
+                'AND size = ? AND mtime = ? AND device = ? AND inode = ?', (
+                    record.path, hasher.value, record.size, record.mtime,
+                    record.device, record.inode
+                )
+            ).fetchone()
+        return row[0] if row else ''
+
+    @ensure_annotations
+    def set(self, record: FileRecord, hasher: Hasher, value: str):
+        """
+        Store the hash of a file.
+        """
+        with self.lock:
+            self.database.execute(
+                'INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)', (
+                    record.path, hasher.value, record.size, record.mtime,
+                    record.device, record.inode, value
+                )
+            )
+
+    def close(self):
+        """
+        Write the changes and close the database.
+        """
+        self.database.commit()
+        self.database.close()
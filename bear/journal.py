@@ -0,0 +1,115 @@
+"""
+Module for the checkpoint journal of computed hashes.
+"""
+
+from os import listdir
+from os.path import join
+from time import monotonic
+from ensure import ensure_annotations
+
+from bear.common import Hasher
+
+
+@ensure_annotations
+def journal_name(master_pid: int, pid: int, thread: int,
+                 hasher: Hasher) -> str:
+    """
+    Create a name of a journal file of a hashing process (and thread).
+    """
+    return f'bear_m{master_pid}_s{pid}_t{thread}_{hasher.name.lower()}.txt'
+
+
+@ensure_annotations
+def parse_line(line: str) -> tuple:
+    """
+    Parse a hash + path line with optional size and modification time
+    columns of a journal into (hash, path, size, mtime), the size and
+    the modification time are -1 if missing.
+    """
+    value, path = line.rstrip('\n').split('\t', 1)
+    size = mtime = -1
+    parts = path.rsplit('\t', 2)
+    if len(parts) == 3 and all(
+            part.lstrip('-').isdigit() for part in parts[1:]
+    ):
+        path, size, mtime = parts[0], int(parts[1]), int(parts[2])
+    return value, path, size, mtime
+
+
+@ensure_annotations
+def read_journal(folder: str, hasher: Hasher) -> dict:
+    """
+    Read all the journal files of a hashing algorithm in a folder into
+    path + (hash, size, mtime) values.
+    """
+    result = {}
+    suffix = f'_{hasher.name.lower()}.txt'
+    for name in sorted(listdir(folder)):
+        if not name.startswith('bear_m') or not name.endswith(suffix):
+            continue
+        with open(join(folder, name)) as file:
+            for line in file:
+                # a line cut off by a crash
+                if not line.endswith('\n'):
+                    continue
+                value, path, size, mtime = parse_line(line)
+                result[path] = (value, size, mtime)
+    return result
+
+
+class Journal:
+    """
+    Append-only journal of hash + path lines (+ size + mtime for --resume)
+    of a hashing worker readable by --hashfiles, so that already computed
+    hashes can be loaded again if the master process doesn't finish.
+
+    The file stays open and the lines are written in batches after
+    a count of lines or a time interval in seconds, whichever comes
+    first, instead of opening the file for every hashed file.
+    """
+
+    batch: int = 1000
+    interval: float = 5.0
+
+    @ensure_annotations
+    def __init__(self, path: str):
+        self.path = path
+        self.lines = []
+        self.flushed = monotonic()
+        # pylint: disable=consider-using-with
+        self.file = open(path, 'a')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    @ensure_annotations
+    def write(self, value: str, path: str, record=None):
+        """
+        Add a hash of a file to the journal, with the size and mtime
+        columns from a FileRecord of the file if there's one.
+        """
+        columns = f'\t{record.size}\t{record.mtime}' if record else ''
+        self.lines.append(f'{value}\t{path}{columns}\n')
+        if len(self.lines) >= self.batch:
+            self.flush()
+        elif monotonic() - self.flushed >= self.interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the pending lines to the journal file.
+        """
+        self.file.writelines(self.lines)
+        self.file.flush()
+        self.lines = []
+        self.flushed = monotonic()
+
+    def close(self):
+        """
+        Write the pending lines and close the journal file.
+        """
+        self.flush()
+        self.file.close()
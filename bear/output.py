@@ -3,26 +3,175 @@ Module for output-related functions.
 """
 
 import logging
-from os import walk, cpu_count, getpid, remove, listdir
+from os import (
+    scandir, cpu_count, getpid, stat, makedirs, listdir, remove
+)
 from os.path import exists, join, abspath, realpath
 from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from threading import Lock
 from datetime import datetime
+from tempfile import mkdtemp
+from shutil import rmtree
 from functools import partial
+from operator import itemgetter
+from typing import Iterable
 from ensure import ensure_annotations
 
 from bear.common import (
-    Hasher, oversized_file, regex_exclude, pattern_exclude
+    Hasher, Stage, FileRecord, ignore_append, file_path
 )
-from bear.hashing import hash_files
+from bear.hashing import hash_files, hash_text, new_hash
+from bear.compare import compare_groups
+from bear.devices import DevicePools
+from bear.throttle import throttle_open, pool_options
 from bear.context import Context
+from bear.cache import HashCache
+from bear.incremental import ScanIndex
+from bear.journal import read_journal, parse_line
+from bear.binindex import HashIndex, is_index, load_indexes
+from bear.dupindex import DuplicateIndex
 
 LOG = logging.getLogger(__name__)
 
+# batches of files per hashing process and the cost of opening a file
+# in bytes for balancing the batches
+BATCHES_PER_JOB = 4
+FILE_COST = 64 * 1024
+
 
 @ensure_annotations
-def find_files(ctx: Context, folder: str) -> list:
+def list_folder(folder: str) -> tuple:
     """
-    Walk a folder to create a flat list of files.
+    List a folder the same way as walk() does, return a list of DirEntry
+    objects of the files and a list of the folder names. Symlinks
+    to folders are neither files nor walked folders.
+    """
+    files = []
+    folders = []
+    throttle_open()
+    try:
+        with scandir(folder) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    files.append(entry)
+                elif not entry.is_symlink():
+                    folders.append(entry.name)
+    except OSError:
+        LOG.warning('Could not list folder %s! Skipping.', folder)
+    return files, folders
+
+
+@ensure_annotations
+def list_folder_indexed(folder: str, index: ScanIndex) -> tuple:
+    """
+    List names of (files, folders) in a folder, reuse the listing from
+    the index of the previous scan if the folder wasn't modified since.
+    """
+    throttle_open()
+    try:
+        mtime = stat(folder).st_mtime_ns
+    except OSError:
+        LOG.warning('Could not stat folder %s! Skipping.', folder)
+        return [], []
+
+    listing = index.get_folder(path=folder, mtime=mtime)
+    if not listing:
+        entries, folders = list_folder(folder=folder)
+        listing = ([entry.name for entry in entries], folders)
+        index.set_folder(
+            path=folder, mtime=mtime, files=listing[0], folders=listing[1]
+        )
+    return listing
+
+
+def scan_file(ctx: Context, folder: str, entry) -> FileRecord:
+    """
+    Create a FileRecord from a DirEntry or a file name in a folder,
+    None if the file is excluded or can't be accessed.
+    """
+    name = entry if isinstance(entry, str) else entry.name
+    path = join(folder, name)
+
+    if ctx.path_filter.excluded(path):
+        return None
+
+    throttle_open()
+    try:
+        # DirEntry caches the result or has it from listing already
+        info = stat(path) if isinstance(entry, str) else entry.stat()
+    except OSError:
+        LOG.warning('Could not stat file %s! Skipping.', path)
+        ignore_append(path)
+        return None
+
+    if ctx.max_size and info.st_size > ctx.max_size:
+        return None
+    return FileRecord.from_stat(path=path, info=info)
+
+
+def scan_folder(ctx: Context, folder: str, index: ScanIndex = None) -> tuple:
+    """
+    List a single folder and create FileRecord objects of its files,
+    return the records and the paths of the subfolders to walk.
+
+    Subfolders excluded by the --exclude patterns are pruned without
+    walking them, see PathFilter.pruned().
+    """
+    if index:
+        files, subfolders = list_folder_indexed(folder=folder, index=index)
+    else:
+        files, subfolders = list_folder(folder=folder)
+
+    records = []
+    for entry in files:
+        record = scan_file(ctx=ctx, folder=folder, entry=entry)
+        if record:
+            records.append(record)
+    return records, [
+        path for path in (join(folder, sub) for sub in subfolders)
+        if not ctx.path_filter.pruned(path)
+    ]
+
+
+def scan_parallel(ctx: Context, folder: str, index: ScanIndex = None) -> dict:
+    """
+    Scan all the folders below a folder with ctx.walk_jobs threads,
+    return the scan_folder() results keyed by the folder path.
+
+    Each listed subfolder is queued immediately, so that the folders are
+    listed concurrently, which helps mostly on network filesystems where
+    listing a folder waits for a round trip to the server.
+    """
+    listings = {}
+    with ThreadPoolExecutor(max_workers=ctx.walk_jobs) as executor:
+        pending = {
+            executor.submit(scan_folder, ctx, folder, index): folder
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                listings[name] = future.result()
+                for sub in listings[name][1]:
+                    future = executor.submit(scan_folder, ctx, sub, index)
+                    pending[future] = sub
+    return listings
+
+
+def scan_files(ctx: Context, folder: str, index: ScanIndex = None) -> list:
+    """
+    Walk a folder to create a flat list of FileRecord objects in the same
+    order as walk() does, each of the files is stat'ed only once.
+
+    With the index of the previous scan list again only the folders
+    modified since then and reuse the indexed listing for the rest.
+    Files in unchanged folders are still stat'ed, modifying a file
+    doesn't change the modification time of its folder.
+
+    With ctx.walk_jobs > 1 the folders are scanned in parallel first
+    and assembled in the walk() order afterwards.
     """
 
     result = []
@@ -31,22 +180,106 @@ def find_files(ctx: Context, folder: str) -> list:
         LOG.critical('Folder %s does not exist! Skipping.', folder)
         return result
 
-    for name, _, files in walk(folder):
-        for fname in files:
-            path = join(name, fname)
+    listings = None
+    if ctx.walk_jobs > 1:
+        listings = scan_parallel(ctx=ctx, folder=folder, index=index)
 
-            if pattern_exclude(value=path, patterns=ctx.exclude):
-                continue
-            if regex_exclude(value=path, regexes=ctx.exclude_regex):
-                continue
-            if oversized_file(path=path, limit=ctx.max_size):
-                continue
+    folders = [folder]
+    while folders:
+        name = folders.pop()
+        if listings is None:
+            records, subfolders = scan_folder(
+                ctx=ctx, folder=name, index=index
+            )
+        else:
+            records, subfolders = listings.pop(name)
+        result.extend(records)
 
-            result.append(path)
+        # depth-first in the listed order as walk() does
+        folders.extend(reversed(subfolders))
 
     return result
 
 
+@ensure_annotations
+def find_files(ctx: Context, folder: str) -> list:
+    """
+    Walk a folder to create a flat list of files.
+    """
+    return [record.path for record in scan_files(ctx=ctx, folder=folder)]
+
+
+@ensure_annotations
+def group_by_size(files: list) -> dict:
+    """
+    Group paths of FileRecord objects by their size in bytes. Only
+    the files sharing the size with at least one other file can be
+    duplicates and need hashing.
+    """
+
+    result = {}
+    for record in files:
+        if record.size not in result:
+            result[record.size] = [record.path]
+        else:
+            result[record.size].append(record.path)
+    return result
+
+
+@ensure_annotations
+def group_inodes(files: list) -> tuple:
+    """
+    Collapse FileRecord objects of paths sharing an inode (hardlinks),
+    return the records of the first path of each inode and (device,
+    inode) + FileRecord objects of the inodes with multiple paths.
+    Only the first path needs hashing, the rest is the same storage.
+    """
+    unique = []
+    first = {}
+    links = {}
+    for record in files:
+        # no inode numbers on some filesystems
+        if not record.inode:
+            unique.append(record)
+            continue
+
+        key = (record.device, record.inode)
+        if key not in first:
+            first[key] = record
+            unique.append(record)
+        elif key not in links:
+            links[key] = [first[key], record]
+        else:
+            links[key].append(record)
+
+    LOG.info(
+        'Found %d paths sharing %d inodes, 0 bytes reclaimable',
+        sum(len(paths) for paths in links.values()), len(links)
+    )
+    return unique, links
+
+
+@ensure_annotations
+def to_records(hashes: dict, records: dict) -> dict:
+    """
+    Replace paths in hash + paths values with FileRecord objects from
+    traversing, stat() only the paths not traversed.
+    """
+    result = {}
+    for key, paths in hashes.items():
+        result[key] = []
+        for path in paths:
+            record = records.get(path)
+            if not record:
+                try:
+                    record = FileRecord.from_stat(path=path, info=stat(path))
+                except OSError:
+                    LOG.warning('Could not stat file %s! Skipping.', path)
+                    continue
+            result[key].append(record)
+    return result
+
+
 @ensure_annotations
 def filter_files(files: dict) -> dict:
     """
@@ -58,95 +291,506 @@ def filter_files(files: dict) -> dict:
 
 
 @ensure_annotations
-def find_duplicates(ctx: Context, hasher: Hasher) -> dict:
+def batch_files(files: list, processes: int) -> list:
+    """
+    Split (size, path) pairs into batches of paths with about the same
+    amount of bytes to read, BATCHES_PER_JOB batches per process, so that
+    a process finishing early picks up the next batch. The largest files
+    go first, the batches of small files fill the gaps at the end.
+
+    Each file counts with FILE_COST bytes more for opening it.
     """
-    Find duplicates in multiple folders with multiprocessing.
+    # stable sort, files of the same size keep their order
+    files = sorted(files, key=itemgetter(0), reverse=True)
+    limit = sum(
+        size + FILE_COST for size, _ in files
+    ) / max(processes * BATCHES_PER_JOB, 1)
+
+    batches = []
+    batch = []
+    batch_size = 0
+    for size, path in files:
+        batch.append(path)
+        batch_size += size + FILE_COST
+        if batch_size >= limit:
+            batches.append(batch)
+            batch = []
+            batch_size = 0
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def map_batches(pool, func, files: list, processes: int) -> list:
     """
+    Map byte-balanced batches of (size, path) pairs to a Pool one batch
+    at a time as the processes become free, return an iterator of
+    the results of the batches as they're done, so that each result can
+    be joined and released before the next one arrives.
+
+    DevicePools get the batches of each device balanced for the workers
+    of the device instead.
+    """
+    if isinstance(pool, DevicePools):
+        return pool.imap(func, {
+            device: batch_files(
+                files=part, processes=pool.processes(device)
+            )
+            for device, part in pool.split(files).items()
+        })
+
+    # imap() keeps the results in the order of the batches, so that
+    # the duplicates are listed in a deterministic order
+    return pool.imap(func, batch_files(files=files, processes=processes))
+
+
+@ensure_annotations
+def split_groups(groups: list, results: Iterable) -> list:
+    """
+    Split (size, files) groups of candidates by the hashes from a partial
+    hashing stage and keep only the groups with more than a single file.
+    """
+    hashes = {
+        path: key
+        for result in results
+        for key, paths in result.items()
+        for path in paths
+    }
+
+    split = []
+    for size, group in groups:
+        subgroups = {}
+        for path in group:
+            # unreadable files are already reported by hashing
+            if path not in hashes:
+                continue
+            key = hashes[path]
+            if key not in subgroups:
+                subgroups[key] = [path]
+            else:
+                subgroups[key].append(path)
+        split.extend(
+            (size, subgroup)
+            for subgroup in subgroups.values()
+            if len(subgroup) > 1
+        )
+    return split
+
+
+@ensure_annotations
+def log_stage(name: str, groups: list):
+    """
+    Log how many (size, files) groups of candidates are left after
+    a stage of finding duplicates.
+    """
+    LOG.info(
+        'Stage %s: %d files in %d groups', name,
+        sum(len(group) for _, group in groups), len(groups)
+    )
+
+
+def split_known(groups: list, lookup) -> tuple:
+    """
+    Split the (size, files) groups of candidates by the hashes known from
+    the lookup function. Return the groups without any known hash, files
+    without a known hash from the other groups, which can't be narrowed
+    down by partial hashes and need to be hashed completely, and the known
+    hash + files.
+    """
+    remaining = []
+    unknown = []
+    hashes = {}
+    for size, group in groups:
+        known = {}
+        for path in group:
+            value = lookup(path)
+            if value:
+                known[path] = value
+
+        if not known:
+            remaining.append((size, group))
+            continue
+
+        unknown.extend(path for path in group if path not in known)
+        for path, value in known.items():
+            if value not in hashes:
+                hashes[value] = [path]
+            else:
+                hashes[value].append(path)
+    return remaining, unknown, hashes
+
+
+@ensure_annotations
+def split_cached(ctx: Context, hasher: Hasher, groups: list,
+                 records: dict) -> tuple:
+    """
+    Split the (size, files) groups of candidates by the hashes stored
+    in the cache, see split_known().
+    """
+    with HashCache(ctx.cache) as cache:
+        return split_known(groups=groups, lookup=lambda path: cache.get(
+            record=records[path], hasher=hasher
+        ))
+
+
+@ensure_annotations
+def split_indexed(index: ScanIndex, hasher: Hasher, groups: list,
+                  records: dict) -> tuple:
+    """
+    Split the (size, files) groups of candidates by the hashes of files
+    unchanged since the previous scan, see split_known().
+    """
+    return split_known(groups=groups, lookup=lambda path: index.get(
+        record=records[path], hasher=hasher
+    ))
+
+
+@ensure_annotations
+def split_journaled(journaled: dict, groups: list, records: dict) -> tuple:
+    """
+    Split the (size, files) groups of candidates by the path + (hash,
+    size, mtime) values from the journal of an unfinished scan, only
+    for the files unchanged since then, see split_known().
+    """
+    def lookup(path):
+        value, size, mtime = journaled.get(path, ('', -1, -1))
+        record = records[path]
+        if (size, mtime) != (record.size, record.mtime):
+            return ''
+        return value
+    return split_known(groups=groups, lookup=lookup)
+
+
+@ensure_annotations
+def open_journal(ctx: Context, master_pid: int) -> str:
+    """
+    Get the folder for the journal of the hashing processes, either
+    a temporary one or the --resume folder.
+    """
+    if not ctx.resume:
+        return mkdtemp(prefix=f'bear_m{master_pid}_')
+    makedirs(ctx.resume, exist_ok=True)
+    return ctx.resume
+
+
+@ensure_annotations
+def close_journal(ctx: Context, journal: str):
+    """
+    Remove the journal of a finished scan, in the --resume folder only
+    the journal files, the folder is user-specified.
+    """
+    if not ctx.resume:
+        rmtree(journal, ignore_errors=True)
+        return
+    for name in listdir(journal):
+        if name.startswith('bear_m') and name.endswith('.txt'):
+            remove(join(journal, name))
+
+
+class HashSink:
+    """
+    Destination of the complete hashes of the traversed files, joining
+    them into a DuplicateIndex and storing them in the ScanIndex for
+    the next scan (if any).
+
+    The threads of the threads backend add the hashes into it one by
+    one under its lock, so that no dict of all the hashes is built.
+    """
+
+    @ensure_annotations
+    def __init__(self, files: DuplicateIndex, hasher: Hasher,
+                 records: dict, index=None):
+        self.files = files
+        self.hasher = hasher
+        self.records = records
+        self.index = index
+        self.lock = Lock()
+
+    @ensure_annotations
+    def add(self, value: str, path: str):
+        """
+        Add a hash of a file.
+        """
+        with self.lock:
+            self.files.add(value=value, path=path)
+            if self.index:
+                self.index.set(
+                    record=self.records[path], hasher=self.hasher,
+                    value=value
+                )
+
+    @ensure_annotations
+    def update(self, hashes: dict):
+        """
+        Add hash + paths values.
+        """
+        for value, paths in hashes.items():
+            for path in paths:
+                self.add(value=value, path=path)
+
+
+def map_hashes(pool, ctx: Context, processes: int, files: list,
+               sink: HashSink = None, **kwargs):
+    """
+    Hash batches of (size, path) pairs in a pool, the keyword arguments
+    are passed to hash_files(), and return an iterator of hash + files
+    results of the batches, see map_batches().
+
+    With the threads backend and a sink all of the threads add the hashes
+    into the sink instead, the results are empty.
+    """
+    if ctx.backend == 'threads' and sink:
+        kwargs['sink'] = sink
+    # because starmap uses positional args which will become unsafer
+    # on each change to the workflow (i.e. more work to find bugs)
+    return map_batches(
+        pool=pool, processes=processes, files=files,
+        func=partial(hash_files, ctx=ctx, **kwargs)
+    )
+
+
+@ensure_annotations
+def open_pools(ctx: Context, processes: int, records: dict):
+    """
+    Create a Pool of the hashing workers (a ThreadPool for the threads
+    backend), or DevicePools with a pool per device of the records
+    for --device-pools.
+    """
+    pool_class = ThreadPool if ctx.backend == 'threads' else Pool
+    if ctx.device_pools:
+        return DevicePools(
+            pool_class=pool_class, records=records, jobs=processes,
+            rotational_jobs=ctx.rotational_jobs
+        )
+    # the workers share the rate limits of the master process
+    return pool_class(processes=processes, **pool_options())
+
+
+def hash_groups(ctx: Context, hasher: Hasher, groups: list,
+                master_pid: int, files: list = None, journal: str = '',
+                records: dict = None, sink: HashSink = None):
+    """
+    Hash (size, files) groups of candidates by their head and tail blocks,
+    then completely (or compared with compare_group), and yield hash + files
+    results per batch. The flat files are hashed only completely, with
+    the threads backend into the sink.
+    """
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    # pylint: disable=too-many-locals
     # get user specified or max jobs
-    folders = ctx.duplicates
     processes = ctx.jobs if ctx.jobs != 0 else cpu_count()
 
+    # (stage, block size, bytes hashed by the previous stages)
+    stages = [
+        (Stage.HEAD, ctx.head_size, 0),
+        (Stage.TAIL, ctx.tail_size, ctx.head_size)
+    ]
+
+    # hash batches of files
+    with open_pools(
+        ctx=ctx, processes=processes, records=records or {}
+    ) as pool:
+        for stage, block, skip in stages:
+            # hashing a block covering the whole file is the same
+            # as hashing the whole file, leave it for the last stage
+            staged = [group for group in groups if group[0] > block + skip]
+            if not block or not staged:
+                continue
+
+            # only a block is read from each file, the results are
+            # released one by one while splitting the groups
+            results = map_hashes(
+                pool=pool, ctx=ctx, processes=processes, files=[
+                    (block, file) for _, group in staged for file in group
+                ], hasher=hasher, master_pid=master_pid, stage=stage
+            )
+            groups = [
+                group for group in groups if group[0] <= block + skip
+            ] + split_groups(groups=staged, results=results)
+            log_stage(name=stage.name, groups=groups)
+
+        # small groups are compared byte by byte instead of hashing each
+        # of the files, reading stops as soon as the files differ
+        compared = [
+            (size * len(group), group) for size, group in groups
+            if len(group) <= ctx.compare_group
+        ]
+        groups = [
+            group for group in groups if len(group[1]) > ctx.compare_group
+        ]
+        if compared:
+            yield from map_batches(
+                pool=pool, processes=processes, files=compared,
+                func=partial(
+                    compare_groups, hasher=hasher, ctx=ctx,
+                    master_pid=master_pid, journal=journal
+                )
+            )
+            log_stage(name='COMPARE', groups=groups)
+
+        # the fast hash only groups the files, the configured one is
+        # computed only for the files colliding in it
+        fast = Hasher[ctx.fingerprint.upper()] if ctx.fingerprint else hasher
+        if fast != hasher and groups:
+            results = map_hashes(
+                pool=pool, ctx=ctx, processes=processes, files=[
+                    (size, file) for size, group in groups for file in group
+                ], hasher=fast, master_pid=master_pid
+            )
+            groups = split_groups(groups=groups, results=results)
+            log_stage(name='FINGERPRINT', groups=groups)
+
+        yield from map_hashes(
+            pool=pool, ctx=ctx, processes=processes, files=(files or []) + [
+                (size, file) for size, group in groups for file in group
+            ], hasher=hasher, master_pid=master_pid, journal=journal,
+            sink=sink
+        )
+
+
+@ensure_annotations
+def find_duplicates(ctx: Context, hasher: Hasher,
+                    hardlinks: dict = None) -> dict:
+    """
+    Find duplicates in multiple folders with multiprocessing and return
+    hash + FileRecord objects of the duplicated files. Files sharing
+    an inode are hashed once, the others are put into hardlinks.
+    """
+    # pylint: disable=too-many-locals
+    index = ScanIndex(ctx.incremental) if ctx.incremental else None
+
     # traverse the input folders
     found = [
-        find_files(ctx=ctx, folder=abspath(realpath(folder)))
-        for folder in folders
+        record
+        for folder in ctx.duplicates
+        for record in scan_files(
+            ctx=ctx, folder=abspath(realpath(folder)), index=index
+        )
+    ]
+    # overlapping folders list the same paths again
+    records = {record.path: record for record in found}
+    found, links = group_inodes(files=list(records.values()))
+    if hardlinks is not None:
+        hardlinks.update(links)
+
+    # files with unique size can't have a duplicate, empty files
+    # are all the same and don't need to be read at all
+    sizes = group_by_size(files=found)
+    empty = sizes.pop(0, [])
+    groups = [
+        (size, file_list)
+        for size, file_list in sizes.items()
+        if len(file_list) > 1
     ]
-    files = [file for file_list in found for file in file_list]
-    files_len = len(files)
-    chunk_size = int(files_len // processes)
-    if chunk_size == 0:
-        # watch out for zero division
-        LOG.critical((
-            'Zero chunk size for files: %d, processes: %d! '
-            'Using 1 as default.'
-        ), files_len, processes)
-        chunk_size = 1
-
-    # hash chunks of flat list files
+    log_stage(name='SIZE', groups=groups)
+
+    # files already hashed in previous runs need no reading
+    unknown = []
+    indexed = {}
+    if index:
+        groups, unknown, indexed = split_indexed(
+            index=index, hasher=hasher, groups=groups, records=records
+        )
+        log_stage(name='INDEX', groups=groups)
+    cached = {}
+    if ctx.cache:
+        groups, uncached, cached = split_cached(
+            ctx=ctx, hasher=hasher, groups=groups, records=records
+        )
+        unknown.extend(uncached)
+        log_stage(name='CACHE', groups=groups)
+
+    # checkpoint journal of the hashing processes
     master_pid = getpid()
-    with Pool(processes=processes) as pool:
-        results = pool.map(
-            # because starmap uses positional args which will become unsafer
-            # on each change to the workflow (i.e. more work to find bugs)
-            partial(hash_files, hasher=hasher, master_pid=master_pid), [
-                # chunk files into smaller lists
-                files[idx: idx + chunk_size]
-                for idx in range(files_len)
-                if idx % chunk_size == 0
-            ]
+    journal = open_journal(ctx=ctx, master_pid=master_pid)
+    LOG.info('Writing hashes into journal %s', journal)
+    journaled = {}
+    if ctx.resume:
+        groups, unjournaled, journaled = split_journaled(
+            journaled=read_journal(folder=journal, hasher=hasher),
+            groups=groups, records=records
         )
+        unknown.extend(unjournaled)
+        log_stage(name='RESUME', groups=groups)
 
     # load saved duplicates if any, otherwise {}
-    files = load_duplicates_from_hashfiles(ctx=ctx)
-
-    # join values from all jobs
-    for result in results:
-        for key, val in result.items():
-            if key not in files:
-                files[key] = val
-            else:
-                files[key].extend(val)
+    files = DuplicateIndex(digest_size=new_hash(hasher).digest_size)
+    files.update(load_duplicates_from_hashfiles(ctx=ctx))
+
+    # join values of each batch as it's done, release each result once
+    # joined, the threads backend adds the hashes into the sink directly
+    sink = HashSink(files=files, hasher=hasher, records=records, index=index)
+    for result in hash_groups(
+            ctx=ctx, hasher=hasher, groups=groups,
+            master_pid=master_pid,
+            files=[(records[path].size, path) for path in unknown],
+            journal=journal, records=records, sink=sink
+    ):
+        sink.update(result)
+    sink.update(cached)
+    sink.update(journaled)
+    files.update(indexed)
+    if len(empty) > 1:
+        files.update({hash_text(inp=b'', hasher=hasher): empty})
+
+    if index:
+        index.close()
+    if ctx.cache:
+        with HashCache(ctx.cache) as cache:
+            cache.prune(max_age=ctx.cache_age, max_entries=ctx.cache_entries)
 
     # Pool terminated, results properly joined (no out of memory exc)
-    # remove partial results as these are not needed anymore
-    for file in listdir("."):
-        if f"bear_m{master_pid}_" not in file:
-            continue
-        if "_hashes.txt" not in file:
-            continue
-        remove(file)
+    # remove the journal as it's not needed anymore
+    close_journal(ctx=ctx, journal=journal)
 
-    # filter out non-duplicates
-    return filter_files(files)
+    # only duplicates with hex hashes and full paths
+    return to_records(hashes=dict(files.items()), records=records)
 
 
 @ensure_annotations
 def load_duplicates_from_hashfiles(ctx: Context) -> dict:
     """
     Find duplicates from previous temporary output (mainly if MP deadlocked).
+
+    Binary indexes are scanned in the sorted order of the digests without
+    loading them into memory, unless mixed with the text hashfiles.
     """
+    indexes = [path for path in ctx.hashfiles if is_index(path)]
+    texts = [path for path in ctx.hashfiles if path not in indexes]
+    if indexes and not texts:
+        return load_indexes(paths=indexes)
+
     # join values from hashfiles
     files = {}
-    for hashfile in ctx.hashfiles:
+    for hashfile in texts:
         with open(hashfile) as file:
             lines = file.readlines()
         for line in lines:
             # pylint: disable=redefined-builtin
-            hash, path = line.split("\t")
+            # journals have extra size and mtime columns
+            hash, path, _, _ = parse_line(line)
             path = path.strip()
             if hash not in files:
                 files[hash] = [path]
             else:
                 files[hash].append(path)
 
+    for hashindex in indexes:
+        with HashIndex(hashindex) as index:
+            for digest, idx in index.digests():
+                files.setdefault(digest.hex(), []).append(
+                    index.entry_path(idx)
+                )
+
     # filter out non-duplicates
     return filter_files(files)
 
 
 @ensure_annotations
-def output_duplicates(hashes: dict, out: str = ''):
+def output_duplicates(hashes: Iterable, out: str = ''):
     """
-    Output a simple structure for the duplicates:
+    Output a simple structure for the duplicates from a dict or from
+    an iterable of (hash, files) pairs streamed one by one:
 
     <hash>:
     \t<path>
@@ -155,9 +799,11 @@ def output_duplicates(hashes: dict, out: str = ''):
     """
     stamp = str(datetime.now()).replace(':', '_').replace(' ', '_')
     out = f'{stamp}_duplicates.txt' if not out else out
+    if isinstance(hashes, dict):
+        hashes = hashes.items()
 
     with open(out, 'wb') as fout:
-        for key, val in hashes.items():
+        for key, val in hashes:
             if not isinstance(key, bytes):
                 key = key.encode('utf-8', 'ignore')
 
@@ -167,7 +813,10 @@ def output_duplicates(hashes: dict, out: str = ''):
 
             # tabbed file path(s), exclude invalid characters
             for item in val:
-                fout.write(b'\t' + str(item).encode('utf-8', 'ignore') + b'\n')
+                fout.write(
+                    b'\t' + str(file_path(item)).encode('utf-8', 'ignore')
+                    + b'\n'
+                )
 
             # separator
             fout.write(b'\n\n')
@@ -0,0 +1,120 @@
+"""
+Module for reading the files ahead of hashing them.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from os import fstat
+from ensure import ensure_annotations
+
+from bear.fileio import open_file, advise, POSIX_FADV_WILLNEED
+
+# files opened ahead of the hashed one
+PREFETCH_DEPTH = 2
+
+
+@ensure_annotations
+def open_ahead(path: str, offset: int = 0, length: int = 0,
+               direct: bool = False):
+    """
+    Open a file for reading and advise the kernel to start reading
+    length bytes (0 for all) from the offset (negative from the end)
+    into the page cache, return None if the file can't be opened.
+
+    Files opened for direct reads bypass the page cache, only the opening
+    happens ahead for them.
+    """
+    try:
+        file = open_file(path=path, direct=direct)
+    except OSError:
+        # reported by opening the file again when hashing it
+        return None
+
+    if not direct:
+        try:
+            if offset < 0:
+                offset = max(fstat(file.fileno()).st_size + offset, 0)
+        except OSError:
+            offset = 0
+        advise(
+            file=file, advice=POSIX_FADV_WILLNEED,
+            offset=offset, length=length
+        )
+    return file
+
+
+class Prefetcher:
+    """
+    Background reader of a hashing worker, opening the next files while
+    the current one is hashed and reading the next block of the current
+    file into a second buffer while the previous one is hashed, so that
+    the worker doesn't wait for the disk between the files and the blocks.
+
+    The files are taken in the order of the paths, the skipped ones (e.g.
+    found in the cache) are closed.
+    """
+
+    @ensure_annotations
+    def __init__(self, paths: list, offset: int = 0, length: int = 0,
+                 depth: int = PREFETCH_DEPTH, direct: bool = False):
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self.paths = iter(paths)
+        self.offset = offset
+        self.length = length
+        self.direct = direct
+        # opening the next files and reading the current one at once
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.pending = deque()
+        for _ in range(depth):
+            self.schedule()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def schedule(self):
+        """
+        Start opening the next file from the paths.
+        """
+        path = next(self.paths, None)
+        if path is None:
+            return
+        self.pending.append((path, self.executor.submit(
+            open_ahead, path, offset=self.offset, length=self.length,
+            direct=self.direct
+        )))
+
+    @ensure_annotations
+    def take(self, path: str):
+        """
+        Get an opened file of a path (None if not opened) and start
+        opening the next one.
+        """
+        while self.pending:
+            ahead, future = self.pending.popleft()
+            self.schedule()
+            file = future.result()
+            if ahead == path:
+                return file
+            if file:
+                file.close()
+        return None
+
+    def read(self, file, view):
+        """
+        Start reading a block of an opened file into a buffer.
+        """
+        return self.executor.submit(file.readinto, view)
+
+    def close(self):
+        """
+        Close the files opened ahead and stop the background threads.
+        """
+        while self.pending:
+            _, future = self.pending.popleft()
+            file = future.result()
+            if file:
+                file.close()
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,106 @@
+"""
+Test actions applied on the found duplicates.
+"""
+
+from unittest import TestCase, main
+from unittest.mock import patch
+from errno import EXDEV, EPERM
+from os import stat, listdir, utime
+from os.path import join, exists
+from tempfile import mkdtemp
+from shutil import rmtree
+
+from bear.common import FileRecord
+from bear.actions import LinkEngine, link_file, link_batch
+
+
+class LinkCase(TestCase):
+    """
+    Test replacing duplicates with hardlinks.
+    """
+
+    def setUp(self):
+        self.folder = mkdtemp()
+        for idx, name in enumerate(['x', 'y', 'z']):
+            with open(join(self.folder, name), 'w') as file:
+                file.write('abc')
+            utime(join(self.folder, name), (idx, idx))
+
+    def tearDown(self):
+        rmtree(self.folder)
+
+    def record(self, name: str) -> FileRecord:
+        """
+        Create a file record of a file in the test folder.
+        """
+        path = join(self.folder, name)
+        return FileRecord.from_stat(path=path, info=stat(path))
+
+    def test_link_file(self):
+        """
+        Test replacing a file with a hardlink without leftovers.
+        """
+        link_file(source=self.record('x'), target=self.record('y'))
+        self.assertEqual(self.record('x').inode, self.record('y').inode)
+        self.assertEqual(sorted(listdir(self.folder)), ['x', 'y', 'z'])
+
+    def test_link_file_devices(self):
+        """
+        Test removing a file on a different device or across mounts.
+        """
+        link_file(
+            source=self.record('x'), target=self.record('y')._replace(
+                device=self.record('y').device + 1
+            )
+        )
+        self.assertFalse(exists(join(self.folder, 'y')))
+
+        with patch('bear.actions.link', side_effect=OSError(EXDEV, 'xdev')):
+            link_file(source=self.record('x'), target=self.record('z'))
+        self.assertEqual(listdir(self.folder), ['x'])
+
+    def test_link_batch_error(self):
+        """
+        Test keeping a file if it can't be replaced.
+        """
+        pairs = [(self.record('x'), self.record('y'))]
+        with patch('bear.actions.link', side_effect=OSError(EPERM, 'perm')):
+            self.assertEqual(link_batch(pairs=pairs), 0)
+        with patch('bear.actions.rename', side_effect=OSError(EPERM, 'perm')):
+            self.assertEqual(link_batch(pairs=pairs), 0)
+        self.assertEqual(sorted(listdir(self.folder)), ['x', 'y', 'z'])
+        self.assertNotEqual(self.record('x').inode, self.record('y').inode)
+
+    def test_engine(self):
+        """
+        Test linking groups of paths and records to the oldest file.
+        """
+        with patch('bear.actions.ACTION_BATCH', 1):
+            with LinkEngine(jobs=2) as engine:
+                engine.add(files=[self.record('z'), self.record('x')])
+                engine.add(files=[join(self.folder, 'y'), 'missing'])
+                engine.add(files=[
+                    join(self.folder, 'x'), join(self.folder, 'y')
+                ])
+        self.assertEqual((engine.total, engine.linked), (2, 2))
+        self.assertEqual(
+            {self.record(name).inode for name in ['x', 'y', 'z']},
+            {self.record('x').inode}
+        )
+
+    def test_engine_max_jobs(self):
+        """
+        Test 0 jobs resolving to all of the CPUs like for hashing.
+        """
+        with patch('bear.actions.cpu_count', return_value=3):
+            with LinkEngine(jobs=0) as engine:
+                self.assertEqual(engine.jobs, 3)
+                engine.add(files=[self.record('x'), self.record('y')])
+        self.assertEqual((engine.total, engine.linked), (1, 1))
+        self.assertEqual(
+            self.record('x').inode, self.record('y').inode
+        )
+
+
+if __name__ == '__main__':
+    main()
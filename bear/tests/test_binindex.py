@@ -0,0 +1,106 @@
+"""
+Test binary index of file hashes.
+"""
+
+from unittest import TestCase, main
+from tempfile import mkdtemp
+from shutil import rmtree
+from os import stat
+from os.path import join
+from argparse import Namespace
+
+from bear.binindex import (
+    HashIndex, write_index, load_indexes, is_index, HEADER
+)
+from bear.extsort import convert_hashfiles
+from bear.output import load_duplicates_from_hashfiles
+from bear.context import Context
+
+
+class BinIndexCase(TestCase):
+    """
+    Test writing and loading binary indexes.
+    """
+
+    def setUp(self):
+        self.folder = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.folder)
+
+    def test_write_read(self):
+        """
+        Test sorting entries by digest and storing strings only once.
+        """
+        out = join(self.folder, 'out.idx')
+        write_index(entries=[
+            ('bb', '/some/folder/a', 1),
+            ('aa', '/some/folder/b', 2),
+            ('bb', '/other/a', -1)
+        ], out=out)
+        self.assertTrue(is_index(out))
+
+        with HashIndex(out) as index:
+            self.assertEqual(len(index), 3)
+            self.assertEqual(list(index.digests()), [
+                (b'\xaa', 0), (b'\xbb', 1), (b'\xbb', 2)
+            ])
+            self.assertEqual([index.entry_path(idx) for idx in range(3)], [
+                '/some/folder/b', '/some/folder/a', '/other/a'
+            ])
+
+        # header, 3 * (digest, size, folder, name),
+        # offsets of 4 strings + end, '/some/folder' 'b' 'a' '/other'
+        self.assertEqual(
+            stat(out).st_size, HEADER.size + 3 * 17 + 5 * 8 + 20
+        )
+
+    def test_write_mixed(self):
+        """
+        Test refusing digests of different sizes.
+        """
+        with self.assertRaises(ValueError):
+            write_index(entries=[
+                ('aa', '/a', 1), ('bbbb', '/b', 1)
+            ], out=join(self.folder, 'out.idx'))
+
+    def test_load_indexes(self):
+        """
+        Test finding duplicates across multiple converted hashfiles.
+        """
+        first = join(self.folder, 'first.txt')
+        with open(first, 'w') as file:
+            file.write('01\t/a\n02\t/b\t3\t4\n03\t/c\n')
+        second = join(self.folder, 'second.txt')
+        with open(second, 'w') as file:
+            file.write('03\t/d\n01\t/e\n04\t/f\n')
+
+        paths = []
+        for name in (first, second):
+            paths.append(name + '.idx')
+            convert_hashfiles(hashfiles=[name], out=paths[-1])
+            self.assertFalse(is_index(name))
+
+        self.assertEqual(load_indexes(paths=paths), {
+            '01': ['/a', '/e'], '03': ['/c', '/d']
+        })
+
+    def test_load_hashfiles_mixed(self):
+        """
+        Test loading duplicates from text hashfiles and binary indexes.
+        """
+        text = join(self.folder, 'hashes.txt')
+        with open(text, 'w') as file:
+            file.write('01\t/a\n02\t/b\t3\t4\n')
+        index = join(self.folder, 'hashes.idx')
+        write_index(entries=[('02', '/c', 3), ('03', '/d', 3)], out=index)
+        self.assertEqual(load_duplicates_from_hashfiles(ctx=Context(
+            Namespace(hashfiles=[text, index])
+        )), {'02': ['/b', '/c']})
+        self.assertEqual(load_duplicates_from_hashfiles(ctx=Context(
+            Namespace(hashfiles=[index])
+        )), {})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Test persistent cache of file hashes.
+"""
+
+from unittest import TestCase, main
+from unittest.mock import patch
+from tempfile import mkdtemp
+from shutil import rmtree
+from os import stat
+from os.path import join
+
+from bear.common import Hasher, FileRecord
+from bear.cache import HashCache, DAY
+
+
+def record(path: str) -> FileRecord:
+    """
+    Create a file record of an existing file.
+    """
+    return FileRecord.from_stat(path=path, info=stat(path))
+
+
+class CacheCase(TestCase):
+    """
+    Test HashCache object.
+    """
+
+    def setUp(self):
+        self.folder = mkdtemp()
+        self.path = join(self.folder, 'cache.db')
+        self.files = []
+        for idx in range(3):
+            path = join(self.folder, str(idx))
+            with open(path, 'wb') as file:
+                file.write(b'1' * idx)
+            self.files.append(path)
+
+    def tearDown(self):
+        rmtree(self.folder)
+
+    def test_get_set(self):
+        """
+        Test storing and getting a hash per file identity and hasher.
+        """
+        first, second, _ = [record(path) for path in self.files]
+        with HashCache(self.path) as cache:
+            self.assertEqual(cache.get(record=first, hasher=Hasher.MD5), '')
+            cache.set(record=first, hasher=Hasher.MD5, value='123')
+            cache.set(record=second, hasher=Hasher.SHA256, value='456')
+
+        # persisted between instances
+        with HashCache(self.path) as cache:
+            self.assertEqual(cache.get(record=first, hasher=Hasher.MD5), '123')
+            self.assertEqual(cache.get(record=first, hasher=Hasher.SHA256), '')
+            self.assertEqual(
+                cache.get(record=second, hasher=Hasher.SHA256), '456'
+            )
+            self.assertEqual(cache.get(record=second, hasher=Hasher.MD5), '')
+
+    def test_get_modified(self):
+        """
+        Test ignoring cached hash of a modified file.
+        """
+        with HashCache(self.path) as cache:
+            cache.set(
+                record=record(self.files[1]), hasher=Hasher.MD5, value='123'
+            )
+        with open(self.files[1], 'ab') as file:
+            file.write(b'changed')
+        with HashCache(self.path) as cache:
+            self.assertEqual(
+                cache.get(record=record(self.files[1]), hasher=Hasher.MD5), ''
+            )
+
+    def test_prune(self):
+        """
+        Test removing old and least recently used entries.
+        """
+        infos = [record(path) for path in self.files]
+        with HashCache(self.path) as cache:
+            for idx, info in enumerate(infos):
+                with patch('bear.cache.time', return_value=idx * DAY):
+                    cache.set(record=info, hasher=Hasher.MD5, value=str(idx))
+                    cache.flush()
+
+            with patch('bear.cache.time', return_value=2.5 * DAY):
+                # only the first one is older than 2 days
+                self.assertEqual(cache.prune(max_age=2), 1)
+            self.assertEqual(cache.prune(max_entries=1), 1)
+
+            self.assertEqual([
+                cache.get(record=info, hasher=Hasher.MD5) for info in infos
+            ], ['', '', '2'])
+
+
+if __name__ == '__main__':
+    main()
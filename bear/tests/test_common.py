@@ -3,7 +3,7 @@ Text functions and objects from bear.common.
 """
 
 from unittest import TestCase, main
-from unittest.mock import patch, MagicMock, call
+from unittest.mock import patch, call
 
 from datetime import datetime
 
@@ -13,67 +13,36 @@ class CommonCase(TestCase):
     TestCase for common functions and objects.
     """
 
-    def test_oversized_file(self):
+    def test_path_filter(self):
         """
-        Test whether a file is within a limit.
+        Test excluding a value with compiled patterns and regexes.
         """
-        from bear.common import oversized_file
-
-        file = "!!" * 10000  # kind of lazy to do "random"
-        limit = 1  # 1 byte limit, mock will be 2 bytes
-
-        isfile_patch = patch("bear.common.isfile")
-        stat_patch = patch("bear.common.stat", return_value=MagicMock(
-            **{"st_size": limit + 1}
-        ))
-
-        with isfile_patch as mock_isfile, stat_patch as mock_stat:
-            self.assertTrue(oversized_file(path=file, limit=1))
-            mock_isfile.assert_called_once_with(file)
-            mock_stat.assert_called_once_with(file)
-
-    def test_oversized_file_not(self):
-        """
-        Test whether a file is within a limit.
-        """
-        from bear.common import oversized_file
-
-        file = "!!" * 10000  # kind of lazy to do "random"
-        limit = 1  # 1 byte limit, mock will be 2 bytes
-
-        isfile_patch = patch("bear.common.isfile")
-        stat_patch = patch("bear.common.stat", return_value=MagicMock(
-            **{"st_size": limit - 1}
-        ))
-
-        with isfile_patch as mock_isfile, stat_patch as mock_stat:
-            self.assertFalse(oversized_file(path=file, limit=1))
-            mock_isfile.assert_called_once_with(file)
-            mock_stat.assert_called_once_with(file)
-
-    def test_pattern_exclude(self):
-        """
-        Test excluding a value with patterns included in that value.
-        """
-        from bear.common import pattern_exclude
-        self.assertFalse(pattern_exclude("test", patterns=["a", "b", "c"]))
-        self.assertTrue(pattern_exclude("test", patterns=["a", "b", "st"]))
-        self.assertTrue(pattern_exclude("test", patterns=["a", "te", "st"]))
-
-    def test_regex_exclude(self):
-        """
-        Test excluding a value with regex matches of that value.
-        """
-        from bear.common import regex_exclude
-        self.assertTrue(regex_exclude(
-            "/some/fol der/test", regexes=["^/some", ".*"]
-        ))
-        self.assertTrue(regex_exclude(
-            "/some/fol der/test", regexes=[".*/test", "test"]
-        ))
-        self.assertFalse(regex_exclude(
-            "/some/fol der/test", regexes=["nottest", "no.*match"]
-        ))
+        from bear.common import PathFilter
+        path = "/some/fol der/test"
+        self.assertFalse(PathFilter(patterns=[], regexes=[]).excluded(path))
+        self.assertTrue(PathFilter(
+            patterns=["a", "te", "st"], regexes=[]
+        ).excluded("test"))
+        self.assertTrue(PathFilter(
+            patterns=[], regexes=[".*/test", "test"]
+        ).excluded(path))
+        self.assertTrue(PathFilter(
+            patterns=["a", "r/t"], regexes=[]
+        ).excluded(path))
+        self.assertFalse(PathFilter(
+            patterns=["a", ".*"], regexes=["nottest", "no.*match"]
+        ).excluded(path))
+        self.assertTrue(PathFilter(
+            patterns=["a"], regexes=["nottest", "^/some/[^/]+ der"]
+        ).excluded(path))
+        # inline flags can't be joined into a single regex
+        self.assertTrue(PathFilter(
+            patterns=[], regexes=["(?i)nottest", "(?i)/TEST$"]
+        ).excluded(path))
+        # backreferences are numbered within each of the regexes
+        self.assertTrue(PathFilter(
+            patterns=[], regexes=[r"(a)\1", r"(b)\1"]
+        ).excluded("/x/bb"))
 
     def test_remove_except_oldest(self):
         """
@@ -129,6 +98,29 @@ class CommonCase(TestCase):
             [call(item) for item in data][::-1][1:]
         )
 
+    def test_remove_records(self):
+        """
+        Test removing files using modification time from file records.
+        """
+        from bear.common import (
+            remove_except_oldest as reo, remove_except_newest as ren,
+            FileRecord
+        )
+        data = [
+            FileRecord(path=path, size=1, mtime=mtime, inode=0, device=0)
+            for path, mtime in [("bbb", 2), ("aaa", 1), ("ccc", 3)]
+        ]
+
+        remove_patch = patch("bear.common.remove")
+        stat_patch = patch("bear.common.stat")
+        with stat_patch as mock_stat, remove_patch as mock_remove:
+            reo(data)
+            ren(data)
+        mock_stat.assert_not_called()
+        self.assertEqual(mock_remove.call_args_list, [
+            call("bbb"), call("ccc"), call("bbb"), call("aaa")
+        ])
+
 
 if __name__ == '__main__':
     main()
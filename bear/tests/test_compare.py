@@ -0,0 +1,167 @@
+"""
+Test comparing candidate files block by block.
+"""
+
+from unittest import TestCase, main
+from unittest.mock import patch
+from os.path import join
+from argparse import Namespace
+from tempfile import mkdtemp, NamedTemporaryFile
+from shutil import rmtree
+from multiprocessing.pool import ThreadPool
+
+from bear.common import Hasher
+from bear.context import Context
+from bear.hashing import hash_text, file_record
+from bear.cache import HashCache
+from bear.journal import read_journal
+from bear.output import find_duplicates
+from bear.compare import compare_files, compare_groups
+
+
+class CompareCase(TestCase):
+    """
+    Test splitting candidate groups by their blocks.
+    """
+
+    def setUp(self):
+        self.folder = mkdtemp()
+        self.paths = {}
+        for name, content in [
+                ('a', b'aabbcc'), ('b', b'aabbcc'), ('c', b'aabbcd'),
+                ('d', b'xxbbcc'), ('e', b'aabbcd')
+        ]:
+            self.paths[name] = join(self.folder, name)
+            with open(self.paths[name], 'wb') as file:
+                file.write(content)
+
+    def tearDown(self):
+        rmtree(self.folder)
+
+    def test_compare_files(self):
+        """
+        Test splitting a group and hashing only the duplicates.
+        """
+        reads = []
+
+        def opener(path, mode):
+            # pylint: disable=consider-using-with
+            file = open(path, mode)
+            original = file.read
+
+            def read(size):
+                reads.append(path)
+                return original(size)
+            file.read = read
+            return file
+
+        with patch('bear.compare.open', side_effect=opener, create=True):
+            result = compare_files(
+                paths=[self.paths[name] for name in 'abcde'],
+                hasher=Hasher.MD5, block=2
+            )
+
+        self.assertEqual(result, {
+            hash_text(inp=b'aabbcc', hasher=Hasher.MD5): [
+                self.paths['a'], self.paths['b']
+            ],
+            hash_text(inp=b'aabbcd', hasher=Hasher.MD5): [
+                self.paths['c'], self.paths['e']
+            ]
+        })
+        # unique after the first block
+        self.assertEqual(reads.count(self.paths['d']), 1)
+        # three blocks and the end of the file
+        self.assertEqual(reads.count(self.paths['a']), 4)
+
+    def test_compare_groups(self):
+        """
+        Test comparing groups and skipping missing files.
+        """
+        with patch('bear.compare.ignore_append') as ignore:
+            result = compare_groups(groups=[
+                [self.paths['a'], self.paths['d']],
+                [self.paths['c'], self.paths['e'], join(self.folder, 'x')]
+            ], hasher=Hasher.SHA256)
+        ignore.assert_called_once_with(join(self.folder, 'x'))
+        self.assertEqual(result, {
+            hash_text(inp=b'aabbcd', hasher=Hasher.SHA256): [
+                self.paths['c'], self.paths['e']
+            ]
+        })
+
+    def test_find_duplicates(self):
+        """
+        Test comparing small groups instead of hashing them.
+        """
+        ctx = Context(Namespace(
+            duplicates=[self.folder], jobs=1, files=[], traverse=[],
+            hash=[], head_size=0, tail_size=0, compare_group=5
+        ))
+        with patch('bear.output.Pool', new=ThreadPool), patch(
+                'bear.output.hash_files'
+        ) as mock_hash:
+            result = find_duplicates(ctx=ctx, hasher=Hasher.MD5)
+
+        mock_hash.assert_not_called()
+        self.assertEqual({
+            key: sorted(item.path for item in val)
+            for key, val in result.items()
+        }, {
+            hash_text(inp=b'aabbcc', hasher=Hasher.MD5): [
+                self.paths['a'], self.paths['b']
+            ],
+            hash_text(inp=b'aabbcd', hasher=Hasher.MD5): [
+                self.paths['c'], self.paths['e']
+            ]
+        })
+
+    def test_find_duplicates_processes(self):
+        """
+        Test comparing in a process Pool, the function is pickled.
+        """
+        ctx = Context(Namespace(
+            duplicates=[self.folder], jobs=2, files=[], traverse=[],
+            hash=[], head_size=0, tail_size=0, compare_group=5
+        ))
+        result = find_duplicates(ctx=ctx, hasher=Hasher.MD5)
+        self.assertEqual({
+            key: sorted(item.path for item in val)
+            for key, val in result.items()
+        }, {
+            hash_text(inp=b'aabbcc', hasher=Hasher.MD5): [
+                self.paths['a'], self.paths['b']
+            ],
+            hash_text(inp=b'aabbcd', hasher=Hasher.MD5): [
+                self.paths['c'], self.paths['e']
+            ]
+        })
+
+    def test_compare_groups_store(self):
+        """
+        Test storing the hashes of the duplicates in the cache
+        and the journal, the files split off have none.
+        """
+        with NamedTemporaryFile(dir=self.folder, suffix='.db') as tmp:
+            cache_path = tmp.name
+        ctx = Context(Namespace(cache=cache_path))
+        journal = mkdtemp(dir=self.folder)
+        value = hash_text(inp=b'aabbcc', hasher=Hasher.MD5)
+
+        compare_groups(groups=[
+            [self.paths['a'], self.paths['b'], self.paths['d']]
+        ], hasher=Hasher.MD5, ctx=ctx, master_pid=1, journal=journal)
+
+        journaled = read_journal(folder=journal, hasher=Hasher.MD5)
+        self.assertEqual(sorted(journaled), [self.paths['a'], self.paths['b']])
+        self.assertEqual(journaled[self.paths['a']][0], value)
+        with HashCache(cache_path) as cache:
+            for name, expected in [('a', value), ('b', value), ('d', '')]:
+                self.assertEqual(cache.get(
+                    record=file_record(path=self.paths[name]),
+                    hasher=Hasher.MD5
+                ), expected)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,7 @@ Text Context object.
 """
 
 from unittest import TestCase, main
+from unittest.mock import patch
 from argparse import Namespace
 
 from ensure import EnsureError
@@ -37,6 +38,29 @@ class ContextCase(TestCase):
         ctx = Context(Namespace(md5=False, blake2=True, sha256=False))
         self.assertEqual(ctx.hasher, Hasher.BLAKE2)
 
+    def test_hasher_optional(self):
+        """
+        Test getting an optional Hasher only if it's available.
+        """
+        from hashlib import sha1
+        with patch.dict('bear.hashers.HASHERS', {Hasher.XXH128: sha1}):
+            ctx = Context(Namespace(md5=True, xxh128=True))
+            self.assertEqual(ctx.hasher, Hasher.XXH128)
+
+        with patch.dict('bear.hashers.HASHERS'):
+            from bear.hashers import HASHERS
+            HASHERS.pop(Hasher.XXH128, None)
+            with self.assertRaises(ValueError):
+                Context(Namespace(md5=True, xxh128=True))
+
+    def test_hasher_tree(self):
+        """
+        Test getting the tree variant of a Hasher.
+        """
+        ctx = Context(Namespace(md5=True, blake2=True, tree_hash=True))
+        self.assertEqual(ctx.hasher, Hasher.BLAKE2_TREE)
+        self.assertEqual(ctx.hasher.base, Hasher.BLAKE2)
+
     def test_hasher_invalid_setup(self):
         """
         Test getting Hasher from Context configuration.
@@ -0,0 +1,122 @@
+"""
+Test hashing the files of each device in its own pool.
+"""
+
+from unittest import TestCase, main
+from unittest.mock import patch, call
+from os import makedirs, symlink, makedev
+from os.path import join
+from argparse import Namespace
+from tempfile import mkdtemp
+from shutil import rmtree
+from multiprocessing.pool import ThreadPool
+
+from bear.common import Hasher, FileRecord
+from bear.context import Context
+from bear.devices import DevicePools, is_rotational
+from bear.output import find_duplicates, map_batches
+
+
+class DevicesCase(TestCase):
+    """
+    Test DevicePools object and detecting rotational disks.
+    """
+
+    def setUp(self):
+        self.folder = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.folder)
+
+    def test_is_rotational(self):
+        """
+        Test finding the queue of a disk for its partition in the sysfs.
+        """
+        disk = join(self.folder, 'devices', 'sda')
+        makedirs(join(disk, 'sda1'))
+        makedirs(join(disk, 'queue'))
+        with open(join(disk, 'queue', 'rotational'), 'w') as file:
+            file.write('1\n')
+        nvme = join(self.folder, 'devices', 'nvme0n1')
+        makedirs(join(nvme, 'queue'))
+        with open(join(nvme, 'queue', 'rotational'), 'w') as file:
+            file.write('0\n')
+
+        block = join(self.folder, 'block')
+        makedirs(block)
+        symlink(join(disk, 'sda1'), join(block, '8:1'))
+        symlink(nvme, join(block, '259:0'))
+
+        with patch('bear.devices.SYS_DEV_BLOCK', block):
+            self.assertTrue(is_rotational(makedev(8, 1)))
+            self.assertFalse(is_rotational(makedev(259, 0)))
+            # e.g. tmpfs
+            self.assertFalse(is_rotational(makedev(0, 42)))
+
+    def test_map_batches(self):
+        """
+        Test batching the files of each device for its own workers.
+        """
+        records = {
+            path: FileRecord(
+                path=path, size=1, mtime=0, inode=idx, device=device
+            )
+            for idx, (path, device) in enumerate([
+                ('a', 2), ('b', 1), ('c', 2), ('d', 2)
+            ])
+        }
+        pools = DevicePools(
+            pool_class=ThreadPool, records=records, jobs=4,
+            rotational_jobs=1
+        )
+        files = [(1, path) for path in records] + [(2, ['b', 'a'])]
+        self.assertEqual(pools.split(files), {
+            1: [(1, 'b'), (2, ['b', 'a'])],
+            2: [(1, 'a'), (1, 'c'), (1, 'd')]
+        })
+
+        with patch('bear.devices.is_rotational', new=lambda dev: dev == 2):
+            with patch('bear.devices.pool_options', return_value={}):
+                with patch.object(
+                        pools, 'pool_class', wraps=ThreadPool
+                ) as pool_class:
+                    with pools:
+                        # the largest files first in the batches of each
+                        # device, the devices in turns
+                        self.assertEqual(list(map_batches(
+                            pool=pools, func=list, files=files, processes=4
+                        )), [[['b', 'a']], ['a'], ['b'], ['c'], ['d']])
+                    self.assertEqual(pool_class.call_args_list, [
+                        call(processes=4), call(processes=1)
+                    ])
+        self.assertEqual(pools.pools, {})
+
+    def test_find_duplicates(self):
+        """
+        Test finding the same duplicates with a pool per device.
+        """
+        for name in 'abc':
+            with open(join(self.folder, name), 'w') as file:
+                file.write('x' if name == 'c' else 'dup')
+
+        results = []
+        for device_pools in (False, True):
+            ctx = Context(Namespace(
+                duplicates=[self.folder], jobs=2, files=[], traverse=[],
+                hash=[], device_pools=device_pools
+            ))
+            with patch('bear.output.Pool', new=ThreadPool):
+                results.append({
+                    key: sorted(record.path for record in records)
+                    for key, records in find_duplicates(
+                        ctx=ctx, hasher=Hasher.MD5
+                    ).items()
+                })
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(list(results[1].values()), [[
+            join(self.folder, 'a'), join(self.folder, 'b')
+        ]])
+
+
+if __name__ == '__main__':
+    main()
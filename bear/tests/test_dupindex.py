@@ -0,0 +1,138 @@
+"""
+Test compact in-memory index of hashed files.
+"""
+
+import tracemalloc
+from unittest import TestCase, main
+from unittest.mock import patch
+from argparse import Namespace
+from hashlib import md5
+from multiprocessing.pool import ThreadPool
+
+from bear.common import Hasher, FileRecord
+from bear.context import Context
+from bear.dupindex import DuplicateIndex
+from bear.output import find_duplicates
+
+
+def hashed(count: int) -> dict:
+    """
+    Create hex hash + paths of files in nested folders, a pair of
+    duplicates for every unique hash.
+    """
+    result = {}
+    for idx in range(count):
+        value = md5(str(idx // 2).encode('utf-8')).hexdigest()
+        path = f'/home/user/photos/{idx // 100}/IMG_{idx:08}.jpg'
+        result.setdefault(value, []).append(path)
+    return result
+
+
+def allocated(func) -> int:
+    """
+    Measure memory allocated by the result of a function.
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = func()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    assert result is not None
+    return after - before
+
+
+class DuplicateIndexCase(TestCase):
+    """
+    Test DuplicateIndex object.
+    """
+
+    def test_items(self):
+        """
+        Test listing duplicates in the order of digests with full paths.
+        """
+        index = DuplicateIndex(digest_size=2)
+        index.update({'ffff': ['/a/1', '/b/2'], '0000': ['/a/3']})
+        index.update({'0000': ['/a/4'], 'ffff': ['/a/5'], '1111': ['/c/6']})
+        # not a hex digest of the size
+        index.update({'xyz': ['/d/7', '/d/8'], 'ab': ['/d/9']})
+
+        self.assertEqual(len(index), 9)
+        self.assertEqual(list(index.items()), [
+            ('0000', ['/a/3', '/a/4']),
+            ('ffff', ['/a/1', '/b/2', '/a/5']),
+            ('xyz', ['/d/7', '/d/8'])
+        ])
+        # interned folders
+        self.assertEqual(list(index.folders), ['/a', '/b', '/c'])
+
+    def test_memory(self):
+        """
+        Benchmark memory per file of the index against a dict of hex
+        hashes and lists of paths.
+        """
+        count = 20000
+        dict_size = allocated(lambda: hashed(count))
+
+        def build():
+            index = DuplicateIndex(digest_size=16)
+            for value, paths in hashed(count).items():
+                for path in paths:
+                    index.add(value=value, path=path)
+            return index
+        index_size = allocated(build)
+
+        # ~180 B per file in a dict, ~50 B per file in the index
+        self.assertLess(index_size * 3, dict_size)
+        self.assertLess(index_size / count, 64)
+
+    def test_find_duplicates_memory(self):
+        """
+        Benchmark the peak memory of finding duplicates, the hashes are
+        joined into the index batch by batch (or one by one with threads)
+        instead of collecting all of them first.
+        """
+        count = 20000
+        hashes = {}
+        for value, paths in hashed(count).items():
+            for idx, path in enumerate(paths):
+                # every tenth hash is duplicated
+                hashes[path] = value if int(path[-12:-4]) % 20 < 2 else (
+                    md5(f'{path}{idx}'.encode('utf-8')).hexdigest()
+                )
+        found = [
+            FileRecord(
+                path=path, size=idx // 2 + 1, mtime=0, inode=idx + 1,
+                device=1
+            )
+            for idx, path in enumerate(hashes)
+        ]
+        dict_size = allocated(lambda: {
+            value: [path] for path, value in hashes.items()
+        })
+
+        for backend in ('processes', 'threads'):
+            ctx = Context(Namespace(
+                duplicates=['/home'], jobs=2, files=[], traverse=[],
+                hash=[], head_size=0, tail_size=0, backend=backend
+            ))
+            with patch('bear.output.scan_files', new=lambda **_: found), \
+                    patch('bear.output.Pool', new=ThreadPool), \
+                    patch('bear.hashing.hash_file',
+                          new=lambda path, **_: hashes[path]):
+                tracemalloc.start()
+                try:
+                    result = find_duplicates(ctx=ctx, hasher=Hasher.MD5)
+                    peak = tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+            self.assertEqual(len(result), count // 20)
+            # ~3x the dict with the records and the size groups of
+            # the traversal, ~4x when all the results of the batches
+            # were collected before joining them
+            self.assertLess(peak, dict_size * 3.5, backend)
+
+
+if __name__ == '__main__':
+    main()
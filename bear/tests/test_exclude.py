@@ -0,0 +1,65 @@
+"""
+Test pruning the excluded folders while walking.
+"""
+
+from unittest import TestCase, main
+from os import makedirs
+from os.path import join
+from argparse import Namespace
+from tempfile import mkdtemp
+from shutil import rmtree
+
+from bear.common import PathFilter
+from bear.context import Context
+from bear.output import find_files
+
+
+class ExcludeCase(TestCase):
+    """
+    Test excluding folders and the files inside them.
+    """
+
+    def setUp(self):
+        self.folder = mkdtemp()
+        makedirs(join(self.folder, 'foo', 'bar'))
+        for path in ['foo/x', 'foo/bar/y', 'z']:
+            with open(join(self.folder, path), 'w') as file:
+                file.write(path)
+
+    def tearDown(self):
+        rmtree(self.folder)
+
+    def test_pruned(self):
+        """
+        Test pruning folders only on the substring patterns.
+        """
+        path_filter = PathFilter(
+            patterns=['node_modules'], regexes=['foo/[^/]*$', 'foo(?!/x)']
+        )
+        self.assertTrue(path_filter.pruned('/a/node_modules'))
+        self.assertTrue(path_filter.excluded('/a/foo/'))
+        self.assertFalse(path_filter.pruned('/a/foo'))
+
+    def test_find_files_regex(self):
+        """
+        Test an end-anchored regex matching a folder prefix excluding
+        only the files it matches, not the whole folder.
+        """
+        ctx = Context(Namespace(
+            duplicates=[], files=[], traverse=[], hash=[],
+            exclude_regex=['foo/[^/]*$']
+        ))
+        self.assertEqual(sorted(find_files(ctx=ctx, folder=self.folder)), [
+            join(self.folder, 'foo', 'bar', 'y'), join(self.folder, 'z')
+        ])
+
+        ctx = Context(Namespace(
+            duplicates=[], files=[], traverse=[], hash=[], exclude=['foo/']
+        ))
+        self.assertEqual(find_files(ctx=ctx, folder=self.folder), [
+            join(self.folder, 'z')
+        ])
+
+
+if __name__ == '__main__':
+    main()
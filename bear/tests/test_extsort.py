@@ -0,0 +1,106 @@
+"""
+Test finding duplicates in hashfiles with an external merge sort.
+"""
+
+from unittest import TestCase, main
+from unittest.mock import patch
+from tempfile import mkdtemp
+from shutil import rmtree
+from os import listdir
+from os.path import join
+from argparse import Namespace
+
+from bear.extsort import stream_duplicates, sort_entries, convert_hashfiles
+from bear.binindex import write_index, HashIndex
+from bear.output import load_duplicates_from_hashfiles
+from bear.context import Context
+
+
+class ExtSortCase(TestCase):
+    """
+    Test streaming duplicates with bounded memory.
+    """
+
+    def setUp(self):
+        self.folder = mkdtemp()
+        self.hashfiles = []
+        for idx in range(3):
+            self.hashfiles.append(join(self.folder, f'{idx}.txt'))
+            with open(self.hashfiles[-1], 'w') as file:
+                for num in range(20):
+                    # every hash is in multiple files, some unique
+                    file.write(f'{(num * 7) % 23:02}\t/{idx}/{num}\t1\t2\n')
+
+    def tearDown(self):
+        rmtree(self.folder)
+
+    def test_sort_entries(self):
+        """
+        Test sorting with spill files merged in multiple passes.
+        """
+        entries = [(f'{(num * 7) % 10}', f'/{num}') for num in range(50)]
+        with patch('bear.extsort.MAX_SPILLS', new=3):
+            # a spill file per entry
+            result = sort_entries(entries, memory_limit=1, folder=self.folder)
+            # merged spill files are removed
+            self.assertLess(len(listdir(self.folder)), 3 + len(
+                self.hashfiles
+            ))
+            # stable, same hashes in the original order
+            self.assertEqual(
+                list(result), sorted(entries, key=lambda entry: entry[0])
+            )
+
+    def test_stream_duplicates(self):
+        """
+        Test streaming the same duplicates as loading them into memory.
+        """
+        index = join(self.folder, 'hashes.idx')
+        write_index(entries=[('05', '/index', 1)], out=index)
+        hashfiles = self.hashfiles + [index]
+        expected = load_duplicates_from_hashfiles(ctx=Context(
+            Namespace(hashfiles=hashfiles)
+        ))
+
+        with patch('bear.extsort.mkdtemp', side_effect=lambda prefix: mkdtemp(
+                prefix=prefix, dir=self.folder
+        )):
+            result = list(stream_duplicates(
+                hashfiles=hashfiles, memory_limit=1000
+            ))
+        self.assertEqual(result, sorted(expected.items()))
+        self.assertIn('/index', dict(result)['05'])
+        # temporary spill files removed
+        self.assertEqual(sorted(listdir(self.folder)), [
+            '0.txt', '1.txt', '2.txt', 'hashes.idx'
+        ])
+
+    def test_convert_hashfiles(self):
+        """
+        Test converting hashfiles into an index through spill files.
+        """
+        index = join(self.folder, 'hashes.idx')
+        with patch('bear.extsort.mkdtemp', side_effect=lambda prefix: mkdtemp(
+                prefix=prefix, dir=self.folder
+        )):
+            convert_hashfiles(
+                hashfiles=self.hashfiles, out=index, memory_limit=1000
+            )
+        self.assertEqual(sorted(listdir(self.folder)), [
+            '0.txt', '1.txt', '2.txt', 'hashes.idx'
+        ])
+
+        expected = load_duplicates_from_hashfiles(ctx=Context(
+            Namespace(hashfiles=self.hashfiles)
+        ))
+        with HashIndex(index) as idx:
+            self.assertEqual(len(idx), 60)
+            digests = list(idx.digests())
+            self.assertEqual(digests, sorted(digests))
+        self.assertEqual(load_duplicates_from_hashfiles(ctx=Context(
+            Namespace(hashfiles=[index])
+        )), expected)
+
+
+if __name__ == '__main__':
+    main()
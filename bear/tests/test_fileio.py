@@ -0,0 +1,98 @@
+"""
+Test opening the hashed files and advising the kernel about them.
+"""
+
+from unittest import TestCase, main
+from unittest.mock import patch, call, ANY
+from os.path import join
+from argparse import Namespace
+from tempfile import mkdtemp
+from shutil import rmtree
+
+from bear.common import Hasher, Stage
+from bear.context import Context
+from bear.fileio import (
+    open_file, POSIX_FADV_SEQUENTIAL, POSIX_FADV_DONTNEED
+)
+from bear.hashing import hash_file, hash_text, read_options
+
+
+class FileIOCase(TestCase):
+    """
+    Test page cache friendly reading.
+    """
+
+    def setUp(self):
+        self.folder = mkdtemp()
+        self.path = join(self.folder, 'file')
+        # not a multiple of the block size
+        self.data = bytes(range(256)) * 4099
+        with open(self.path, 'wb') as file:
+            file.write(self.data)
+
+    def tearDown(self):
+        rmtree(self.folder)
+
+    def test_open_file(self):
+        """
+        Test falling back to the page cache if O_DIRECT fails.
+        """
+        with patch('bear.fileio.os_open', side_effect=OSError) as mock_open:
+            with open_file(path=self.path, direct=True) as file:
+                self.assertEqual(file.read(), self.data)
+            if mock_open.called:
+                mock_open.assert_called_once_with(self.path, ANY)
+
+        with self.assertRaises(FileNotFoundError):
+            open_file(path=join(self.folder, 'x'), direct=True)
+
+    def test_hash_file(self):
+        """
+        Test reading directly and dropping the pages after hashing.
+        """
+        with patch('bear.fileio.posix_fadvise') as advise:
+            self.assertEqual(hash_file(
+                path=self.path, hasher=Hasher.MD5, direct=True,
+                drop_cache=True, mmap_size=1
+            ), hash_text(inp=self.data, hasher=Hasher.MD5))
+            self.assertEqual(hash_file(
+                path=self.path, hasher=Hasher.MD5, size=10, drop_cache=True
+            ), hash_text(inp=self.data[:10], hasher=Hasher.MD5))
+
+        self.assertEqual(advise.call_args_list, [
+            call(ANY, 0, 0, POSIX_FADV_SEQUENTIAL),
+            call(ANY, 0, 0, POSIX_FADV_DONTNEED),
+            call(ANY, 0, 0, POSIX_FADV_DONTNEED)
+        ])
+
+    def test_read_options(self):
+        """
+        Test reading directly only whole files of the last stage
+        and splitting the cores for the segments of tree hashes.
+        """
+        ctx = Context(Namespace(drop_cache=True, direct_io=True))
+        self.assertEqual(read_options(
+            hasher=Hasher.MD5, stage=Stage.HEAD, ctx=ctx
+        ), {'drop_cache': True})
+        self.assertEqual(read_options(
+            hasher=Hasher.MD5, stage=Stage.FULL, ctx=ctx
+        ), {'drop_cache': True, 'direct': True})
+        self.assertEqual(read_options(
+            hasher=Hasher.MD5, stage=Stage.FULL, ctx=Context(Namespace())
+        ), {})
+
+        # the cores split between the jobs hashing the segments
+        with patch('bear.hashing.cpu_count', return_value=8):
+            for jobs, expected in ((0, 1), (1, 8), (3, 2), (16, 1)):
+                self.assertEqual(read_options(
+                    hasher=Hasher.SHA256_TREE, stage=Stage.FULL,
+                    ctx=Context(Namespace(jobs=jobs))
+                ), {'tree_jobs': expected})
+        self.assertEqual(read_options(
+            hasher=Hasher.SHA256_TREE, stage=Stage.FULL,
+            ctx=Context(Namespace(jobs=4, tree_jobs=3))
+        ), {'tree_jobs': 3})
+
+
+if __name__ == '__main__':
+    main()
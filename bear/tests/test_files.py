@@ -4,23 +4,52 @@ Test file and folder manipulation.
 
 from unittest import TestCase, main
 from unittest.mock import patch, MagicMock, call
+from os import makedirs, walk, utime, stat, symlink, listdir, getpid
 from os.path import join, basename
 from argparse import Namespace
+from tempfile import mkdtemp
+from shutil import rmtree
+from multiprocessing.pool import ThreadPool
+from itertools import count
 
 from ensure import ensure_annotations
 
-from bear.hashing import hash_files
-from bear.common import ignore_append, Hasher
+from bear.hashing import hash_files, hash_file
+from bear.common import ignore_append, Hasher, Stage, FileRecord
 from bear.output import (
-    find_files, filter_files, find_duplicates, output_duplicates
+    find_files, filter_files, find_duplicates, output_duplicates,
+    group_by_size, split_groups, scan_files, list_folder, map_batches,
+    batch_files, FILE_COST
 )
 from bear.context import Context
+from bear.cache import HashCache
+from bear.incremental import ScanIndex
+
+INODES = count(1)
+
+
+def records(sizes: dict) -> list:
+    """
+    Create file records of paths with sizes and unique inodes.
+    """
+    return [
+        FileRecord(path=path, size=size, mtime=0, inode=next(INODES), device=0)
+        for path, size in sizes.items()
+    ]
+
+
+def paths(hashes: dict) -> dict:
+    """
+    Replace file records with paths in hash + records values.
+    """
+    return {key: [item.path for item in val] for key, val in hashes.items()}
 
 
 class HashCase(TestCase):
     """
     Test file and folder manipulation functions.
     """
+    # pylint: disable=too-many-public-methods
 
     @staticmethod
     def test_find_files_nonexisting():
@@ -35,45 +64,375 @@ class HashCase(TestCase):
 
     def test_find_files(self):
         """
-        Test hashing a string.
+        Test listing files in the same order as walk() does.
         """
-        mocked_walk = [(
-            'bear', [
-                'emptyfolder', 'tests', '__pycache__'
-            ], [
-                '__main__.py', '__init__.py'
-            ]
-        ), (
-            'bear/emptyfolder', [], []
-        ), (
-            'bear/tests', ['__pycache__'], [
-                'test_files.py', 'test_main.py',
-                '__init__.py', 'test_hash.py'
-            ]
-        ), (
-            'bear/tests/__pycache__', [], [
-                'test_files.cpython-37.pyc', 'test_hash.cpython-37.pyc',
-                '__init__.cpython-37.pyc', 'test_main.cpython-37.pyc'
-            ]
-        ), (
-            'bear/__pycache__', [], [
-                '__init__.cpython-37.pyc', '__main__.cpython-37.pyc'
-            ]
-        )]
+        folder = mkdtemp()
+        for path in ['a/b/c', 'a/d', 'e']:
+            makedirs(join(folder, path))
+        for path in ['f1', 'f2', 'a/f3', 'a/b/f4', 'a/b/c/f5', 'e/f6']:
+            with open(join(folder, path), 'w') as file:
+                file.write(path)
+        symlink(join(folder, 'a'), join(folder, 'link'))
 
         expected = [
             join(name, fname)
-            for name, folder, files in mocked_walk
+            for name, _, files in walk(folder)
             for fname in files
         ]
-
-        patch_walk = patch('bear.output.walk', return_value=mocked_walk)
-        with patch_walk, patch('bear.output.exists', return_value=True):
+        try:
             self.assertEqual(find_files(
                 ctx=Context(Namespace(
                     duplicates=[], files=[], traverse=[], hash=[]
-                )), folder='_' * 30
+                )), folder=folder
             ), expected)
+        finally:
+            rmtree(folder)
+
+    def test_scan_files_parallel(self):
+        """
+        Test listing folders in parallel in the same order as walk() does.
+        """
+        folder = mkdtemp()
+        for path in ['a/b/c', 'a/d', 'e/f/g', 'h']:
+            makedirs(join(folder, path))
+        for idx, path in enumerate(['', 'a', 'a/b', 'a/b/c', 'e/f/g', 'h']):
+            for fname in ['x', 'y']:
+                with open(join(folder, path, f'{fname}{idx}'), 'w') as file:
+                    file.write(path)
+
+        expected = [
+            join(name, fname)
+            for name, _, files in walk(folder)
+            for fname in files
+        ]
+        ctx = Context(Namespace(
+            duplicates=[], files=[], traverse=[], hash=[], walk_jobs=4
+        ))
+        index_folder = mkdtemp()
+        index = ScanIndex(join(index_folder, 'index.db'))
+        try:
+            self.assertEqual(find_files(ctx=ctx, folder=folder), expected)
+            for _ in range(2):
+                # listing and reusing the index from threads
+                self.assertEqual([
+                    record.path for record in scan_files(
+                        ctx=ctx, folder=folder, index=index
+                    )
+                ], expected)
+        finally:
+            index.close()
+            rmtree(folder)
+            rmtree(index_folder)
+
+    def test_scan_files_prune(self):
+        """
+        Test not walking the excluded folders at all.
+        """
+        folder = mkdtemp()
+        for path in ['a/node_modules/b', 'c.txt', 'd']:
+            makedirs(join(folder, path))
+        for path in [
+                'a/f1', 'a/node_modules/f2', 'a/node_modules/b/f3',
+                'c.txt/f4', 'd/f5.txt'
+        ]:
+            with open(join(folder, path), 'w') as file:
+                file.write(path)
+
+        ctx = Context(Namespace(
+            duplicates=[], files=[], traverse=[], hash=[],
+            exclude=['node_modules'], exclude_regex=[r'\.txt$']
+        ))
+        try:
+            with patch(
+                'bear.output.list_folder', side_effect=list_folder
+            ) as mocked_list:
+                self.assertEqual(find_files(ctx=ctx, folder=folder), [
+                    join(folder, 'a', 'f1'), join(folder, 'c.txt', 'f4')
+                ])
+            self.assertEqual(sorted(
+                kwargs['folder'] for _, kwargs in mocked_list.call_args_list
+            ), [
+                folder, join(folder, 'a'),
+                join(folder, 'c.txt'), join(folder, 'd')
+            ])
+        finally:
+            rmtree(folder)
+
+    def test_scan_files(self):
+        """
+        Test creating file records with stat() data and filtering them.
+        """
+        folder = mkdtemp()
+        for name, size in [('small', 1), ('big', 10), ('skip', 1)]:
+            with open(join(folder, name), 'wb') as file:
+                file.write(b'1' * size)
+
+        ctx = Context(Namespace(
+            duplicates=[], files=[], traverse=[], hash=[],
+            max_size=5, exclude=['skip']
+        ))
+        try:
+            with patch('bear.output.stat') as mocked_stat:
+                self.assertEqual(scan_files(ctx=ctx, folder=folder), [
+                    FileRecord.from_stat(
+                        path=join(folder, 'small'),
+                        info=stat(join(folder, 'small'))
+                    )
+                ])
+            # reusing stat() data from listing the folder
+            mocked_stat.assert_not_called()
+        finally:
+            rmtree(folder)
+
+    def test_scan_files_incremental(self):
+        """
+        Test listing only folders changed since the previous scan.
+        """
+        folder = mkdtemp()
+        for path in ['a/b/c', 'a/d', 'e']:
+            makedirs(join(folder, path))
+        for path in ['f1', 'a/f2', 'a/b/f3', 'a/b/c/f4', 'e/f5']:
+            with open(join(folder, path), 'w') as file:
+                file.write(path)
+
+        ctx = Context(Namespace(
+            duplicates=[], files=[], traverse=[], hash=[]
+        ))
+        expected = [
+            join(name, fname)
+            for name, _, files in walk(folder)
+            for fname in files
+        ]
+        index_folder = mkdtemp()
+        index = ScanIndex(join(index_folder, 'index.db'))
+        try:
+            self.assertEqual([
+                record.path
+                for record in scan_files(ctx=ctx, folder=folder, index=index)
+            ], expected)
+
+            with open(join(folder, 'a/b/f6'), 'w') as file:
+                file.write('new')
+            # force a different mtime on coarse filesystems
+            info = stat(join(folder, 'a/b'))
+            utime(join(folder, 'a/b'), ns=(
+                info.st_atime_ns, info.st_mtime_ns + 10 ** 9
+            ))
+
+            with patch(
+                'bear.output.list_folder', side_effect=list_folder
+            ) as mocked_list:
+                found = [
+                    record.path for record in scan_files(
+                        ctx=ctx, folder=folder, index=index
+                    )
+                ]
+                mocked_list.assert_called_once_with(
+                    folder=join(folder, 'a/b')
+                )
+            self.assertIn(join(folder, 'a/b/f6'), found)
+            self.assertEqual(len(found), len(expected) + 1)
+        finally:
+            index.close()
+            rmtree(folder)
+            rmtree(index_folder)
+
+    def test_find_duplicates_folder(self):
+        """
+        Test finding duplicates in a real folder.
+        """
+        folder = mkdtemp()
+        for name, content in [('x', 'abc'), ('y', 'abc'), ('z', 'abd')]:
+            with open(join(folder, name), 'w') as file:
+                file.write(content)
+
+        ctx = Context(Namespace(
+            duplicates=[folder], jobs=1, files=[], traverse=[], hash=[]
+        ))
+        try:
+            with patch('bear.output.Pool', new=ThreadPool):
+                result = find_duplicates(ctx=ctx, hasher=Hasher.MD5)
+            self.assertEqual({
+                key: sorted(val) for key, val in paths(result).items()
+            }, {
+                '900150983cd24fb0d6963f7d28e17f72': [
+                    join(folder, 'x'), join(folder, 'y')
+                ]
+            })
+        finally:
+            rmtree(folder)
+
+    def test_find_duplicates_journal(self):
+        """
+        Test writing complete hashes into a journal folder removed
+        by the master process.
+        """
+        folder = mkdtemp()
+        for name in ['x', 'y']:
+            with open(join(folder, name), 'w') as file:
+                file.write('abc')
+
+        ctx = Context(Namespace(
+            duplicates=[folder], jobs=2, files=[], traverse=[], hash=[]
+        ))
+        journal = None
+        try:
+            with patch('bear.output.Pool', new=ThreadPool), \
+                    patch('bear.output.rmtree') as mock_rmtree:
+                find_duplicates(ctx=ctx, hasher=Hasher.MD5)
+            mock_rmtree.assert_called_once()
+            journal = mock_rmtree.call_args[0][0]
+
+            lines = []
+            for name in listdir(journal):
+                self.assertTrue(name.startswith(f'bear_m{getpid()}_'))
+                with open(join(journal, name)) as file:
+                    lines.extend(file.readlines())
+            # the size and mtime columns only with --resume
+            self.assertEqual(sorted(lines), [
+                f'900150983cd24fb0d6963f7d28e17f72\t{join(folder, name)}\n'
+                for name in ['x', 'y']
+            ])
+        finally:
+            rmtree(folder)
+            if journal:
+                rmtree(journal)
+
+    def test_find_duplicates_resume(self):
+        """
+        Test hashing again only the files missing or changed
+        in the journal of an unfinished scan.
+        """
+        folder = mkdtemp()
+        resume = mkdtemp()
+        for name, content in [('x', 'abc'), ('y', 'abc'), ('z', 'abd')]:
+            with open(join(folder, name), 'w') as file:
+                file.write(content)
+        x_path, y_path, z_path = [join(folder, name) for name in 'xyz']
+        with open(join(resume, 'bear_m1_s2_t3_md5.txt'), 'w') as file:
+            file.write(
+                f'900150983cd24fb0d6963f7d28e17f72\t{x_path}'
+                f'\t3\t{stat(x_path).st_mtime_ns}\n'
+                # changed since then
+                f'900150983cd24fb0d6963f7d28e17f72\t{z_path}'
+                f'\t3\t{stat(z_path).st_mtime_ns - 1}\n'
+            )
+        with open(join(resume, 'keep.txt'), 'w') as file:
+            file.write('unrelated')
+
+        ctx = Context(Namespace(
+            duplicates=[folder], jobs=1, files=[], traverse=[], hash=[],
+            resume=resume
+        ))
+        try:
+            with patch('bear.output.Pool', new=ThreadPool), patch(
+                    'bear.hashing.hash_file', wraps=hash_file
+            ) as mock_hash:
+                result = find_duplicates(ctx=ctx, hasher=Hasher.MD5)
+            self.assertEqual(paths(result), {
+                '900150983cd24fb0d6963f7d28e17f72': [y_path, x_path]
+            })
+            self.assertEqual(sorted(
+                kwargs['path'] for _, kwargs in mock_hash.call_args_list
+            ), [y_path, z_path])
+            # journal files removed, the folder kept
+            self.assertEqual(listdir(resume), ['keep.txt'])
+        finally:
+            rmtree(folder)
+            rmtree(resume)
+
+    def test_find_duplicates_threads(self):
+        """
+        Test finding duplicates with the threads backend.
+        """
+        folder = mkdtemp()
+        for name in range(8):
+            with open(join(folder, str(name)), 'wb') as file:
+                file.write(bytes([name % 2]) * 10000)
+
+        ctx = Context(Namespace(
+            duplicates=[folder], jobs=3, files=[], traverse=[], hash=[],
+            backend='threads'
+        ))
+        try:
+            patch_map = patch('bear.output.map_batches', wraps=map_batches)
+            with patch('bear.output.Pool') as mock_pool, patch_map as mapped:
+                result = find_duplicates(ctx=ctx, hasher=Hasher.MD5)
+            mock_pool.assert_not_called()
+            self.assertEqual(sorted(sorted(val) for val in paths(
+                result
+            ).values()), [
+                [join(folder, str(name)) for name in range(0, 8, 2)],
+                [join(folder, str(name)) for name in range(1, 8, 2)]
+            ])
+            # head, tail and full stage, only full hashes into the sink
+            self.assertEqual([
+                'sink' in kwargs['func'].keywords
+                for _, kwargs in mapped.call_args_list
+            ], [False, False, True])
+        finally:
+            rmtree(folder)
+
+    def test_find_duplicates_incremental(self):
+        """
+        Test hashing only files changed since the previous scan.
+        """
+        folder = mkdtemp()
+        for name, content in [('x', 'abc'), ('y', 'abc'), ('z', 'abd')]:
+            with open(join(folder, name), 'w') as file:
+                file.write(content)
+
+        hashed = []
+
+        def fake_hash_files(files, **kwargs):
+            hashed.extend(files)
+            return hash_files(files=files, **kwargs)
+
+        index_folder = mkdtemp()
+        ctx = Context(Namespace(
+            duplicates=[folder], jobs=1, files=[], traverse=[], hash=[],
+            incremental=join(index_folder, 'index.db')
+        ))
+        patch_pool = patch('bear.output.Pool', new=ThreadPool)
+        patch_hash = patch('bear.output.hash_files', new=fake_hash_files)
+        dup = 'abc'.encode('utf-8')
+        try:
+            with patch_pool, patch_hash:
+                expected = {
+                    '900150983cd24fb0d6963f7d28e17f72': [
+                        join(folder, 'x'), join(folder, 'y')
+                    ]
+                }
+                result = find_duplicates(ctx=ctx, hasher=Hasher.MD5)
+                self.assertEqual({
+                    key: sorted(val) for key, val in paths(result).items()
+                }, expected)
+                self.assertTrue(hashed)
+
+                hashed.clear()
+                result = find_duplicates(ctx=ctx, hasher=Hasher.MD5)
+                self.assertEqual({
+                    key: sorted(val) for key, val in paths(result).items()
+                }, expected)
+                self.assertEqual(hashed, [])
+
+                with open(join(folder, 'z'), 'wb') as file:
+                    file.write(dup)
+                info = stat(join(folder, 'z'))
+                utime(join(folder, 'z'), ns=(
+                    info.st_atime_ns, info.st_mtime_ns + 10 ** 9
+                ))
+                result = find_duplicates(ctx=ctx, hasher=Hasher.MD5)
+                expected[
+                    '900150983cd24fb0d6963f7d28e17f72'
+                ].append(join(folder, 'z'))
+                self.assertEqual({
+                    key: sorted(val) for key, val in paths(result).items()
+                }, expected)
+                self.assertEqual(hashed, [join(folder, 'z')])
+        finally:
+            rmtree(folder)
+            rmtree(index_folder)
 
     def test_filter_files(self):
         """
@@ -187,7 +546,7 @@ class HashCase(TestCase):
         # pylint: disable=unused-argument
         # is actually used for kwargs comparison which is more important
         @ensure_annotations
-        def _side_effect(path: str, hasher: Hasher):
+        def _side_effect(path: str, hasher: Hasher, mmap_size: int):
             return file_hash[path]
 
         with patch('bear.hashing.hash_file', side_effect=_side_effect):
@@ -202,6 +561,158 @@ class HashCase(TestCase):
                 expected[val].extend([key])
         self.assertEqual(out, expected)
 
+    def test_hash_files_stages(self):
+        """
+        Test hashing only head or tail blocks of files in partial stages.
+        """
+        patch_hash = patch('bear.hashing.hash_file', return_value='123')
+        patch_open = patch('builtins.open')
+        with patch_hash as mocked, patch_open as mocked_open:
+            ctx = Context(Namespace(head_size=8, tail_size=6))
+            self.assertEqual(hash_files(
+                files=['a'], hasher=Hasher.MD5, stage=Stage.HEAD, ctx=ctx
+            ), {'123': ['a']})
+            self.assertEqual(hash_files(
+                files=['b'], hasher=Hasher.MD5, stage=Stage.TAIL, ctx=ctx
+            ), {'123': ['b']})
+
+            # partial hashes are not written to partial hashfiles
+            mocked_open.assert_not_called()
+            self.assertEqual(mocked.mock_calls, [
+                call(path='a', hasher=Hasher.MD5, size=8),
+                call(path='b', hasher=Hasher.MD5, offset=-6, size=6)
+            ])
+
+    def test_split_groups(self):
+        """
+        Test splitting candidate groups by hashes of a partial stage.
+        """
+        groups = [(10, ['a', 'b', 'c']), (20, ['d', 'e']), (30, ['f', 'g'])]
+        results = [
+            {'123': ['a', 'c', 'd'], '456': ['b']},
+            {'123': ['e'], '789': ['f']}
+        ]
+        # 'g' failed to hash, 'b' and 'f' are unique now and 'd' + 'e'
+        # have the same partial hash as 'a' + 'c' but a different size
+        self.assertEqual(split_groups(groups=groups, results=results), [
+            (10, ['a', 'c']), (20, ['d', 'e'])
+        ])
+
+    def test_find_duplicates_stages(self):
+        """
+        Test narrowing down the candidates with head and tail hashes.
+        """
+        sizes = {
+            '/small1': 10, '/small2': 10,
+            '/big1': 100, '/big2': 100, '/big3': 100, '/big4': 100
+        }
+        stages = {
+            Stage.HEAD: {'h': ['/big1', '/big2', '/big3'], 'x': ['/big4']},
+            Stage.TAIL: {'t': ['/big1', '/big2'], 'y': ['/big3']},
+            Stage.FULL: {'s': ['/small1', '/small2'], 'f': ['/big1']}
+        }
+        calls = []
+
+        def fake_imap(func, batches):
+            calls.append((func.keywords.get('stage', Stage.FULL), batches))
+            return iter([stages[calls[-1][0]]])
+
+        mock_pool = MagicMock(**{'__enter__.return_value.imap': fake_imap})
+        patch_pool = patch('bear.output.Pool', return_value=mock_pool)
+        patch_scan_files = patch(
+            'bear.output.scan_files', return_value=records(sizes)
+        )
+        ctx = Context(Namespace(
+            duplicates=['folder'], jobs=1, files=[], traverse=[], hash=[],
+            head_size=20, tail_size=20
+        ))
+        with patch_pool, patch_scan_files:
+            self.assertEqual(paths(
+                find_duplicates(ctx=ctx, hasher=Hasher.MD5)
+            ), {
+                's': ['/small1', '/small2']
+            })
+
+        # small files are smaller than a block, hashed only completely,
+        # the largest files go first
+        self.assertEqual(calls, [
+            (Stage.HEAD, [['/big1'], ['/big2'], ['/big3'], ['/big4']]),
+            (Stage.TAIL, [['/big1'], ['/big2'], ['/big3']]),
+            (Stage.FULL, [['/big1'], ['/big2'], ['/small1', '/small2']])
+        ])
+
+    def test_hash_files_cache(self):
+        """
+        Test looking up complete hashes in a cache and storing new ones.
+        """
+        cache = MagicMock(**{'get.side_effect': ['123', '']})
+        cache.__class__ = HashCache
+        patch_cache = patch('bear.hashing.HashCache', return_value=cache)
+        info = stat(__file__)
+        patch_stat = patch('bear.hashing.stat', return_value=info)
+        patch_hash = patch('bear.hashing.hash_file', return_value='456')
+        patch_open = patch('builtins.open')
+        ctx = Context(Namespace(cache='cache.db'))
+        # pylint: disable=confusing-with-statement
+        with patch_cache, patch_stat as mock_stat, \
+                patch_hash as mock_hash, patch_open:
+            self.assertEqual(hash_files(
+                files=['cached', 'new'], hasher=Hasher.MD5, ctx=ctx
+            ), {'123': ['cached'], '456': ['new']})
+
+        mock_hash.assert_called_once_with(
+            path='new', hasher=Hasher.MD5, mmap_size=0
+        )
+        self.assertEqual(mock_stat.mock_calls, [call('cached'), call('new')])
+        cache.set.assert_called_once_with(
+            record=FileRecord.from_stat(path='new', info=info),
+            hasher=Hasher.MD5, value='456'
+        )
+        cache.close.assert_called_once_with()
+
+    def test_find_duplicates_cache(self):
+        """
+        Test skipping hashing of cached files.
+        """
+        sizes = {
+            '/a1': 1, '/a2': 1, '/b1': 2, '/b2': 2, '/c1': 3, '/c2': 3
+        }
+        hashes = {'/a1': 'a', '/a2': 'a', '/b1': 'b'}
+        mock_pool = MagicMock(**{
+            '__enter__.return_value.imap.return_value': [
+                {'b': ['/b2'], 'c': ['/c1', '/c2']}
+            ]
+        })
+        cache = MagicMock(**{
+            '__enter__.return_value.get.side_effect':
+                lambda record, hasher: hashes.get(record.path, '')
+        })
+        patch_pool = patch('bear.output.Pool', return_value=mock_pool)
+        patch_cache = patch('bear.output.HashCache', return_value=cache)
+        patch_scan_files = patch(
+            'bear.output.scan_files', return_value=records(sizes)
+        )
+        ctx = Context(Namespace(
+            duplicates=['folder'], jobs=1, files=[], traverse=[], hash=[],
+            cache='cache.db'
+        ))
+        with patch_pool, patch_cache, patch_scan_files:
+            self.assertEqual(paths(
+                find_duplicates(ctx=ctx, hasher=Hasher.MD5)
+            ), {
+                'a': ['/a1', '/a2'], 'b': ['/b2', '/b1'], 'c': ['/c1', '/c2']
+            })
+
+        # only uncached files are hashed, partially cached groups
+        # can't be narrowed down by the partial hashes
+        self.assertEqual(
+            mock_pool.__enter__.return_value.imap.call_args[0][1],
+            [['/c1'], ['/c2'], ['/b2']]
+        )
+        cache.__enter__.return_value.prune.assert_called_once_with(
+            max_age=30, max_entries=0
+        )
+
     def test_find_duplicates_jobs(self):
         """
         Test finding duplicates using correct job count from parameter.
@@ -240,50 +751,64 @@ class HashCase(TestCase):
 
             self.assertEqual([
                 # remove __iter__() calls because those return a tuple
-                # iterator instead of call().__enter__().map().__iter__()
+                # iterator instead of call().__enter__().imap().__iter__()
                 item for item in pool.mock_calls if '__iter__' not in str(item)
             ], [
                 call(processes=1),
                 call().__enter__(),
-                call().__enter__().map(partial_fun(
+                call().__enter__().imap(partial_fun(
                     hash_files, hasher=Hasher.MD5
                 ), []),
                 call().__exit__(None, None, None),
 
                 call(processes=666),
                 call().__enter__(),
-                call().__enter__().map(partial_fun(
+                call().__enter__().imap(partial_fun(
                     hash_files, hasher=Hasher.MD5
                 ), []),
                 call().__exit__(None, None, None),
 
                 call(processes=4),
                 call().__enter__(),
-                call().__enter__().map(partial_fun(
+                call().__enter__().imap(partial_fun(
                     hash_files, hasher=Hasher.MD5
                 ), []),
                 call().__exit__(None, None, None),
             ])
 
+    def test_batch_files(self):
+        """
+        Test balancing batches of files by their size, largest first.
+        """
+        big = FILE_COST * 10
+        self.assertEqual(batch_files(files=[
+            (1, 'a'), (big, 'b'), (1, 'c'), (big // 2, 'd'), (1, 'e'),
+            (big // 2, 'f'), (big, 'g')
+        ], processes=1), [['b'], ['g'], ['d', 'f'], ['a', 'c', 'e']])
+        self.assertEqual(batch_files(files=[], processes=4), [])
+
     def test_find_duplicates_chunks(self):
         """
-        Test chunking list of files for multiple processes.
+        Test batching list of files for multiple processes.
         """
         patch_pool = patch('bear.output.Pool')
 
         files = [str(num) for num in range(15)]
 
         # pylint: disable=dangerous-default-value
-        def side_effect(ctx, folder):
+        def side_effect(ctx, folder, index):
             assert isinstance(ctx, Context)
-            return {
-                'a': files[:5],
-                'b': files[5:10],
-                'c': files[10:]
-            }[basename(folder)]
-
-        patch_find_files = patch(
-            'bear.output.find_files', side_effect=side_effect
+            assert index is None
+            return records({
+                path: 1 for path in {
+                    'a': files[:5],
+                    'b': files[5:10],
+                    'c': files[10:]
+                }[basename(folder)]
+            })
+
+        patch_scan_files = patch(
+            'bear.output.scan_files', side_effect=side_effect
         )
 
         # because partial() != partial() in mock calls!
@@ -291,7 +816,7 @@ class HashCase(TestCase):
         fun_part = patch('bear.output.partial')
 
         # pylint: disable=confusing-with-statement
-        with patch_pool as pool, patch_find_files, fun_part as partial_fun:
+        with patch_pool as pool, patch_scan_files, fun_part as partial_fun:
             self.assertEqual(find_duplicates(
                 ctx=Context(Namespace(
                     duplicates=['a', 'b', 'c'], jobs=1,
@@ -316,35 +841,33 @@ class HashCase(TestCase):
 
             self.assertEqual([
                 # remove __iter__() calls because those return a tuple
-                # iterator instead of call().__enter__().map().__iter__()
+                # iterator instead of call().__enter__().imap().__iter__()
                 item for item in pool.mock_calls if '__iter__' not in str(item)
             ], [
                 call(processes=1),
                 call().__enter__(),
-                # all files to single process
-                call().__enter__().map(partial_fun(
+                # same size files in batches of 15 / (4 per process)
+                call().__enter__().imap(partial_fun(
                     hash_files, hasher=Hasher.MD5
-                ), [files]),
+                ), [files[0:4], files[4:8], files[8:12], files[12:]]),
                 call().__exit__(None, None, None),
 
                 call(processes=3),
                 call().__enter__(),
-                # files chunked len / processors -> 15 // 3 chunks
-                call().__enter__().map(partial_fun(
+                # 15 / (4 per process * 3) -> 2 files per batch
+                call().__enter__().imap(partial_fun(
                     hash_files, hasher=Hasher.MD5
                 ), [
-                    files[0:5], files[5:10], files[10:15]
+                    files[idx: idx + 2] for idx in range(0, 15, 2)
                 ]),
                 call().__exit__(None, None, None),
 
                 call(processes=4),
                 call().__enter__(),
-                # files chunked len / processors -> 15 // 4 chunks
-                call().__enter__().map(partial_fun(
+                # more batches than files -> 1 file per batch
+                call().__enter__().imap(partial_fun(
                     hash_files, hasher=Hasher.MD5
-                ), [
-                    files[0:3], files[3:6], files[6:9], files[9:12], files[12:]
-                ]),
+                ), [[file] for file in files]),
                 call().__exit__(None, None, None),
             ])
 
@@ -353,26 +876,74 @@ class HashCase(TestCase):
         Test joining duplicates from multiple jobs.
         """
         mock_pool = MagicMock(**{
-            '__enter__.return_value.map.return_value': [
+            '__enter__.return_value.imap.return_value': [
                 {'123': ['original'], '456': ['ori', 'dupli']},
                 {'123': ['duplicate']},
                 {'789': ['original'], '012': ['orig', 'dup']}
             ]
         })
         patch_pool = patch('bear.output.Pool', return_value=mock_pool)
+        patch_scan_files = patch(
+            'bear.output.scan_files', return_value=records({
+                path: idx for idx, path in enumerate([
+                    'original', 'duplicate', 'ori', 'dupli', 'orig', 'dup'
+                ])
+            })
+        )
         ctx = Context(Namespace(
-            duplicates=[], jobs=2, files=[], traverse=[], hash=[]
+            duplicates=['folder'], jobs=2, files=[], traverse=[], hash=[]
         ))
-        with patch_pool:
-            # 789 is single-file original, ignored in filter_files()
-            self.assertEqual(find_duplicates(
+        with patch_pool, patch_scan_files:
+            # 789 is single-file original, not a duplicate
+            self.assertEqual(paths(find_duplicates(
                 ctx=ctx, hasher=Hasher.MD5
-            ), {
+            )), {
                 '012': ['orig', 'dup'],
                 '123': ['original', 'duplicate'],
                 '456': ['ori', 'dupli']
             })
 
+    def test_group_by_size(self):
+        """
+        Test grouping paths of file records by size.
+        """
+        self.assertEqual(group_by_size(records({
+            'a': 1, 'b': 0, 'c': 1, 'd': 2
+        })), {1: ['a', 'c'], 0: ['b'], 2: ['d']})
+
+    def test_find_duplicates_sizes(self):
+        """
+        Test hashing only files with a non-unique size and grouping
+        empty files without hashing them.
+        """
+        sizes = {
+            '/unique': 1, '/empty1': 0, '/empty2': 0,
+            '/same1': 2, '/same2': 2
+        }
+        mock_pool = MagicMock(**{
+            '__enter__.return_value.imap.return_value': [
+                {'123': ['/same1', '/same2']}
+            ]
+        })
+        patch_pool = patch('bear.output.Pool', return_value=mock_pool)
+        patch_scan_files = patch(
+            'bear.output.scan_files', return_value=records(sizes)
+        )
+        ctx = Context(Namespace(
+            duplicates=['folder'], jobs=1, files=[], traverse=[], hash=[]
+        ))
+        with patch_pool, patch_scan_files:
+            self.assertEqual(paths(
+                find_duplicates(ctx=ctx, hasher=Hasher.MD5)
+            ), {
+                '123': ['/same1', '/same2'],
+                'd41d8cd98f00b204e9800998ecf8427e': ['/empty1', '/empty2']
+            })
+        self.assertEqual(
+            mock_pool.__enter__.return_value.imap.call_args[0][1],
+            [['/same1'], ['/same2']]
+        )
+
     @staticmethod
     def test_find_duplicates_output():
         """
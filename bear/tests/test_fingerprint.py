@@ -0,0 +1,79 @@
+"""
+Test grouping the candidates by a fast fingerprint hash.
+"""
+
+from unittest import TestCase, main
+from unittest.mock import patch
+from os.path import join
+from argparse import Namespace
+from tempfile import mkdtemp
+from shutil import rmtree
+from multiprocessing.pool import ThreadPool
+
+from bear.common import Hasher
+from bear.context import Context
+from bear.hashing import hash_file
+from bear.output import find_duplicates
+
+
+class FingerprintCase(TestCase):
+    """
+    Test hashing only the files colliding in a fingerprint.
+    """
+
+    def setUp(self):
+        self.folder = mkdtemp()
+        for name, content in [('x', 'abc'), ('y', 'abc'), ('z', 'abd')]:
+            with open(join(self.folder, name), 'w') as file:
+                file.write(content)
+
+    def tearDown(self):
+        rmtree(self.folder)
+
+    def test_find_duplicates(self):
+        """
+        Test keeping the configured hasher for the colliding files only.
+        """
+        ctx = Context(Namespace(
+            duplicates=[self.folder], jobs=1, files=[], traverse=[],
+            hash=[], head_size=0, tail_size=0, fingerprint='blake2'
+        ))
+        with patch('bear.output.Pool', new=ThreadPool), patch(
+                'bear.hashing.hash_file', wraps=hash_file
+        ) as mock_hash:
+            result = find_duplicates(ctx=ctx, hasher=Hasher.SHA256)
+
+        hashed = {}
+        for item in mock_hash.call_args_list:
+            hashed.setdefault(item.kwargs['hasher'], []).append(
+                item.kwargs['path']
+            )
+        self.assertEqual({
+            key: sorted(val) for key, val in hashed.items()
+        }, {
+            Hasher.BLAKE2: [join(self.folder, name) for name in 'xyz'],
+            Hasher.SHA256: [join(self.folder, name) for name in 'xy']
+        })
+        self.assertEqual({
+            key: sorted(item.path for item in val)
+            for key, val in result.items()
+        }, {
+            'ba7816bf8f01cfea414140de5dae2223'
+            'b00361a396177a9cb410ff61f20015ad': [
+                join(self.folder, 'x'), join(self.folder, 'y')
+            ]
+        })
+
+    def test_unavailable(self):
+        """
+        Test failing early on an unavailable fingerprint hasher.
+        """
+        with patch.dict('bear.hashers.HASHERS'):
+            from bear.hashers import HASHERS
+            HASHERS.pop(Hasher.XXH3, None)
+            with self.assertRaises(ValueError):
+                Context(Namespace(fingerprint='xxh3'))
+
+
+if __name__ == '__main__':
+    main()
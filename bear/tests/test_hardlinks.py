@@ -0,0 +1,83 @@
+"""
+Test hashing each inode only once.
+"""
+
+from unittest import TestCase, main
+from unittest.mock import patch
+from os import link
+from os.path import join
+from argparse import Namespace
+from tempfile import mkdtemp
+from shutil import rmtree
+from multiprocessing.pool import ThreadPool
+
+from bear.common import Hasher, FileRecord
+from bear.context import Context
+from bear.output import find_duplicates, group_inodes
+
+
+class HardlinkCase(TestCase):
+    """
+    Test collapsing paths sharing an inode.
+    """
+
+    def setUp(self):
+        self.folder = mkdtemp()
+        for name, content in [('x', 'abc'), ('y', 'abc')]:
+            with open(join(self.folder, name), 'w') as file:
+                file.write(content)
+        link(join(self.folder, 'x'), join(self.folder, 'z'))
+
+    def tearDown(self):
+        rmtree(self.folder)
+
+    def test_group_inodes(self):
+        """
+        Test keeping the first path of an inode, inode 0 is unknown.
+        """
+        first, second, third, fourth, fifth = [
+            FileRecord(path=path, size=1, mtime=0, inode=inode, device=device)
+            for path, inode, device in [
+                ('a', 1, 1), ('b', 1, 2), ('c', 1, 1), ('d', 0, 1),
+                ('e', 0, 1)
+            ]
+        ]
+        self.assertEqual(group_inodes(
+            files=[first, second, third, fourth, fifth]
+        ), ([first, second, fourth, fifth], {(1, 1): [first, third]}))
+
+    def test_find_duplicates(self):
+        """
+        Test hashing a hardlinked file once and reporting it separately.
+        """
+        ctx = Context(Namespace(
+            duplicates=[self.folder, self.folder], jobs=1, files=[],
+            traverse=[], hash=[]
+        ))
+        hardlinks = {}
+        with patch('bear.output.Pool', new=ThreadPool), patch(
+                'bear.hashing.hash_file', return_value='900150'
+        ) as hash_file:
+            result = find_duplicates(
+                ctx=ctx, hasher=Hasher.MD5, hardlinks=hardlinks
+            )
+
+        # either of the links is hashed, depends on the listing order
+        hashed = sorted(
+            call.kwargs['path'] for call in hash_file.call_args_list
+        )
+        self.assertIn(hashed, [
+            [join(self.folder, name), join(self.folder, 'y')]
+            for name in ('x', 'z')
+        ])
+        self.assertEqual({
+            key: sorted(item.path for item in val)
+            for key, val in result.items()
+        }, {'900150': hashed})
+        self.assertEqual([
+            sorted(item.path for item in val) for val in hardlinks.values()
+        ], [[join(self.folder, 'x'), join(self.folder, 'z')]])
+
+
+if __name__ == '__main__':
+    main()
@@ -3,10 +3,13 @@ Test hashing of specific file contents.
 """
 
 from unittest import TestCase, main
+from unittest.mock import patch
 from tempfile import mkstemp
 from os import remove
 from bear.common import Hasher
-from bear.hashing import hash_text, hash_file
+from bear.hashing import (
+    hash_text, hash_file, get_buffer, hash_tree, new_hash
+)
 
 
 class HashCase(TestCase):
@@ -41,6 +44,26 @@ class HashCase(TestCase):
             "9bc33b582f77d30a65e6f29a896c0411f38312e1d66e0bf16386c86a89bea572"
         ), hash_text(inp='test'.encode('utf-8'), hasher=Hasher.BLAKE2))
 
+    def test_hash_word_registered(self):
+        """
+        Test hashing a string with a registered optional algorithm.
+        """
+        from hashlib import sha1
+        from bear.hashers import register_hasher
+
+        with patch.dict('bear.hashers.HASHERS'):
+            register_hasher(hasher=Hasher.XXH3, factory=sha1)
+            self.assertEqual(
+                'a94a8fe5ccb19ba61c4c0873d391e987982fbbd3',
+                hash_text(inp='test'.encode('utf-8'), hasher=Hasher.XXH3)
+            )
+
+        with patch.dict('bear.hashers.HASHERS'):
+            from bear.hashers import HASHERS
+            HASHERS.pop(Hasher.BLAKE3, None)
+            with self.assertRaises(ValueError):
+                hash_text(inp=b'test', hasher=Hasher.BLAKE3)
+
     def test_hash_file_md5(self):
         """
         Test hashing bytes of a file.
@@ -53,6 +76,90 @@ class HashCase(TestCase):
         remove(path)
         self.assertEqual('7972892f41d1b98a71d9583b83267d8b', hashed)
 
+    def test_hash_file_block(self):
+        """
+        Test hashing only the head or the tail block of a file.
+        """
+        (desc, path) = mkstemp(text=False)
+        with open(desc, 'wb') as file:
+            file.write(b'head' + b'-' * 10 + b'tail')
+        head = hash_file(path=path, hasher=Hasher.MD5, size=4)
+        tail = hash_file(path=path, hasher=Hasher.MD5, offset=-4, size=4)
+        middle = hash_file(path=path, hasher=Hasher.MD5, offset=4, size=10)
+        remove(path)
+        self.assertEqual(head, hash_text(inp=b'head', hasher=Hasher.MD5))
+        self.assertEqual(tail, hash_text(inp=b'tail', hasher=Hasher.MD5))
+        self.assertEqual(middle, hash_text(inp=b'-' * 10, hasher=Hasher.MD5))
+
+    def test_hash_file_stream(self):
+        """
+        Test hashing a file bigger than the reused read buffer.
+        """
+        base = bytes(range(256)) * 100
+        (desc, path) = mkstemp(text=False)
+        with open(desc, 'wb') as file:
+            file.write(base)
+
+        with patch('bear.hashing.BUFFER_SIZE', 1000):
+            with patch('bear.hashing.BUFFERS') as buffers:
+                # force a new small buffer for this test
+                buffers.buffer = None
+                hashed = hash_file(path=path, hasher=Hasher.MD5)
+                block = hash_file(
+                    path=path, hasher=Hasher.MD5, offset=10, size=2500
+                )
+                self.assertEqual(len(get_buffer()), 1000)
+
+        mapped = hash_file(path=path, hasher=Hasher.MD5, mmap_size=1)
+        remove(path)
+        self.assertEqual(hashed, hash_text(inp=base, hasher=Hasher.MD5))
+        self.assertEqual(mapped, hashed)
+        self.assertEqual(block, hash_text(
+            inp=base[10:2510], hasher=Hasher.MD5
+        ))
+
+    def test_hash_tree(self):
+        """
+        Test hashing segments of a file concurrently into the same root
+        digest as hashing the segments in order.
+        """
+        from hashlib import sha256
+        from bear.hashers import TreeHash
+
+        base = bytes(range(256)) * 100
+        (desc, path) = mkstemp(text=False)
+        with open(desc, 'wb') as file:
+            file.write(base)
+
+        with patch.object(TreeHash, 'segment', 1000), patch(
+                'bear.hashing.hash_tree', wraps=hash_tree
+        ) as mock_tree:
+            parallel = hash_file(path=path, hasher=Hasher.SHA256_TREE)
+            mock_tree.assert_called_once()
+            sequential = hash_text(inp=base, hasher=Hasher.SHA256_TREE)
+            partial = new_hash(hasher=Hasher.SHA256_TREE)
+            partial.update(base[:1500])
+            copied = partial.copy()
+            copied.update(base[1500:])
+        remove(path)
+
+        self.assertEqual(parallel, sha256(b''.join(
+            sha256(base[idx:idx + 1000]).digest()
+            for idx in range(0, len(base), 1000)
+        )).hexdigest())
+        self.assertEqual(sequential, parallel)
+        self.assertEqual(copied.hexdigest(), parallel)
+        self.assertNotEqual(
+            hash_text(inp=b'test', hasher=Hasher.SHA256_TREE),
+            hash_text(inp=b'test', hasher=Hasher.SHA256)
+        )
+
+    def test_get_buffer_reused(self):
+        """
+        Test allocating the read buffer only once.
+        """
+        self.assertIs(get_buffer(), get_buffer())
+
 
 if __name__ == '__main__':
     main()
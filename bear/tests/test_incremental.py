@@ -0,0 +1,118 @@
+"""
+Test index of a previous scan for incremental rescans.
+"""
+
+from unittest import TestCase, main
+from tempfile import mkdtemp
+from shutil import rmtree
+from os import stat
+from os.path import join
+
+from bear.common import Hasher, FileRecord
+from bear.incremental import ScanIndex
+
+
+class IncrementalCase(TestCase):
+    """
+    Test ScanIndex object.
+    """
+
+    def setUp(self):
+        self.folder = mkdtemp()
+        self.path = join(self.folder, 'index.db')
+
+    def tearDown(self):
+        rmtree(self.folder)
+
+    def test_folder(self):
+        """
+        Test storing a folder listing valid only for the same mtime.
+        """
+        with ScanIndex(self.path) as index:
+            self.assertEqual(index.get_folder(path='/a', mtime=1), ())
+            index.set_folder(
+                path='/a', mtime=1, files=['x', 'y'], folders=['b']
+            )
+            index.set_folder(path='/a/b', mtime=1, files=[], folders=[])
+
+        with ScanIndex(self.path) as index:
+            self.assertEqual(
+                index.get_folder(path='/a', mtime=1), (['x', 'y'], ['b'])
+            )
+            self.assertEqual(index.get_folder(path='/a/b', mtime=1), ([], []))
+            self.assertEqual(index.get_folder(path='/a', mtime=2), ())
+
+    def test_file(self):
+        """
+        Test storing a hash valid only for the same file and hasher.
+        """
+        path = join(self.folder, 'file')
+        with open(path, 'wb') as file:
+            file.write(b'123')
+        record = FileRecord.from_stat(path=path, info=stat(path))
+
+        with ScanIndex(self.path) as index:
+            index.set(record=record, hasher=Hasher.MD5, value='123')
+            self.assertEqual(
+                index.get(record=record, hasher=Hasher.MD5), '123'
+            )
+            self.assertEqual(
+                index.get(record=record, hasher=Hasher.SHA256), ''
+            )
+            self.assertEqual(index.get(
+                record=record._replace(path='other'), hasher=Hasher.MD5
+            ), '')
+
+            with open(path, 'ab') as file:
+                file.write(b'456')
+            self.assertEqual(index.get(
+                record=FileRecord.from_stat(path=path, info=stat(path)),
+                hasher=Hasher.MD5
+            ), '')
+
+    def test_forget_removed(self):
+        """
+        Test removing files and folders missing in a new folder listing.
+        """
+        info = stat(self.folder)
+
+        def record(path):
+            return FileRecord.from_stat(path=path, info=info)
+
+        with ScanIndex(self.path) as index:
+            index.set_folder(
+                path=join('', 'a'), mtime=1, files=['x', 'y'], folders=['b']
+            )
+            index.set_folder(
+                path=join('', 'a', 'b'), mtime=1, files=['z'], folders=[]
+            )
+            index.set_folder(
+                path=join('', 'a', 'bc'), mtime=1, files=[], folders=[]
+            )
+            for path in [join('', 'a', 'x'), join('', 'a', 'y'),
+                         join('', 'a', 'b', 'z')]:
+                index.set(record=record(path), hasher=Hasher.MD5, value='1')
+
+            index.set_folder(
+                path=join('', 'a'), mtime=2, files=['x'], folders=[]
+            )
+
+            self.assertEqual(index.get(
+                record=record(join('', 'a', 'x')), hasher=Hasher.MD5
+            ), '1')
+            for path in [join('', 'a', 'y'), join('', 'a', 'b', 'z')]:
+                self.assertEqual(index.get(
+                    record=record(path), hasher=Hasher.MD5
+                ), '')
+            self.assertEqual(index.get_folder(
+                path=join('', 'a', 'b'), mtime=1
+            ), ())
+
+            # only the folder prefixed with the separator is removed
+            self.assertEqual(index.get_folder(
+                path=join('', 'a', 'bc'), mtime=1
+            ), ([], []))
+
+
+if __name__ == '__main__':
+    main()
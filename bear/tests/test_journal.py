@@ -0,0 +1,132 @@
+"""
+Test checkpoint journal of computed hashes.
+"""
+
+from unittest import TestCase, main
+from unittest.mock import patch
+from tempfile import mkdtemp
+from shutil import rmtree
+from os import getpid
+from os.path import join
+from threading import get_ident
+from argparse import Namespace
+
+from bear.common import Hasher, FileRecord
+from bear.context import Context
+from bear.hashing import hash_files, file_record, hash_text
+from bear.journal import Journal, journal_name, parse_line, read_journal
+
+
+def record(path: str) -> FileRecord:
+    """
+    Create a file record with a fixed size and modification time.
+    """
+    return FileRecord(path=path, size=3, mtime=4, inode=0, device=0)
+
+
+class JournalCase(TestCase):
+    """
+    Test Journal object.
+    """
+
+    def setUp(self):
+        self.folder = mkdtemp()
+        self.path = join(self.folder, journal_name(
+            master_pid=1, pid=2, thread=3, hasher=Hasher.MD5
+        ))
+
+    def tearDown(self):
+        rmtree(self.folder)
+
+    def read(self) -> str:
+        """
+        Read the content of the journal file.
+        """
+        with open(self.path) as file:
+            return file.read()
+
+    def test_batch(self):
+        """
+        Test writing lines after a count of lines and on closing.
+        """
+        with Journal(self.path) as journal:
+            journal.batch = 2
+            journal.write(value='123', path='a', record=record('a'))
+            self.assertEqual(self.read(), '')
+            journal.write(value='456', path='b', record=record('b'))
+            self.assertEqual(self.read(), '123\ta\t3\t4\n456\tb\t3\t4\n')
+            journal.write(value='789', path='c', record=record('c'))
+        self.assertEqual(
+            self.read(), '123\ta\t3\t4\n456\tb\t3\t4\n789\tc\t3\t4\n'
+        )
+
+    def test_interval(self):
+        """
+        Test writing lines after a time interval.
+        """
+        with patch('bear.journal.monotonic', return_value=0):
+            journal = Journal(self.path)
+        try:
+            with patch('bear.journal.monotonic', return_value=1):
+                journal.write(value='123', path='a', record=record('a'))
+            self.assertEqual(self.read(), '')
+            with patch('bear.journal.monotonic', return_value=6):
+                journal.write(value='456', path='b', record=record('b'))
+            self.assertEqual(self.read(), '123\ta\t3\t4\n456\tb\t3\t4\n')
+        finally:
+            journal.close()
+
+    def test_hash_files(self):
+        """
+        Test stat()-ing the journaled files only for --resume.
+        """
+        path = join(self.folder, 'file')
+        with open(path, 'w') as file:
+            file.write('abc')
+        value = hash_text(inp=b'abc', hasher=Hasher.MD5)
+        journal = mkdtemp(dir=self.folder)
+
+        for resume, line in [
+                ('', f'{value}\t{path}\n'),
+                (journal, f'{value}\t{path}\t3\t{file_record(path).mtime}\n')
+        ]:
+            with patch(
+                'bear.hashing.file_record', wraps=file_record
+            ) as stat_file:
+                hash_files(
+                    files=[path], hasher=Hasher.MD5, master_pid=1,
+                    ctx=Context(Namespace(resume=resume)), journal=journal
+                )
+            self.assertEqual(stat_file.call_count, 1 if resume else 0)
+            with open(join(journal, journal_name(
+                    master_pid=1, pid=getpid(), thread=get_ident(),
+                    hasher=Hasher.MD5
+            ))) as file:
+                self.assertEqual(file.readlines()[-1], line)
+
+    def test_parse_line(self):
+        """
+        Test parsing lines with and without size and mtime columns.
+        """
+        self.assertEqual(parse_line('123\t/a\n'), ('123', '/a', -1, -1))
+        self.assertEqual(parse_line('123\t/a\t3\t4\n'), ('123', '/a', 3, 4))
+        self.assertEqual(parse_line('123\t/a\tb\n'), ('123', '/a\tb', -1, -1))
+
+    def test_read_journal(self):
+        """
+        Test reading journal files of a hasher, skipping cut off lines.
+        """
+        with open(self.path, 'w') as file:
+            file.write('123\t/a\t3\t4\n456\t/b\t5\t6\n789\t/c\t')
+        with open(join(self.folder, journal_name(
+                master_pid=1, pid=2, thread=3, hasher=Hasher.SHA256
+        )), 'w') as file:
+            file.write('abc\t/d\t3\t4\n')
+
+        self.assertEqual(read_journal(folder=self.folder, hasher=Hasher.MD5), {
+            '/a': ('123', 3, 4), '/b': ('456', 5, 6)
+        })
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,11 @@ Test running module in CLI.
 from unittest import TestCase, main
 from unittest.mock import patch, call, MagicMock
 from argparse import Namespace
+from os import utime, listdir
+from os.path import join
+from tempfile import mkdtemp
+from shutil import rmtree
+from multiprocessing.pool import ThreadPool
 
 from bear.common import Hasher
 from bear.context import Context
@@ -56,11 +61,19 @@ class MainCase(TestCase):
         )
         with patch_get as get:
             set_log_levels(9000)
-            self.assertEqual(get.mock_calls, [
-                call('bear.hashing'), call('bear'),
-                call('bear.output'), call('bear.__main__')
+
+            # other loggers depend on the imported non-Bear modules
+            names = [item[1][0] for item in get.mock_calls]
+            self.assertEqual(sorted(
+                name for name in names if name.startswith('bear')
+            ), [
+                'bear', 'bear.__main__', 'bear.actions', 'bear.binindex',
+                'bear.cache', 'bear.compare', 'bear.devices', 'bear.extsort',
+                'bear.hashing', 'bear.incremental', 'bear.output'
             ])
-            self.assertEqual(mock_logger.mock_calls, [call.setLevel(9000)] * 4)
+            self.assertEqual(
+                mock_logger.mock_calls, [call.setLevel(9000)] * len(names)
+            )
 
     @staticmethod
     def test_hash_file():
@@ -115,6 +128,124 @@ class MainCase(TestCase):
             self.assertEqual(m_find.return_value, ffile_ret)
             m_filter.assert_called_once_with(m_hash.return_value)
 
+    @staticmethod
+    def test_write_index():
+        """
+        Test converting hashfiles into a binary index.
+        """
+        sysv = patch('sys.argv', [
+            __name__, '--hashfiles', 'a.txt', 'b.txt',
+            '--write-index', 'out.idx'
+        ])
+        convert = patch('bear.__main__.convert_hashfiles')
+        with sysv, convert as mocked:
+            run()
+            mocked.assert_called_once_with(
+                hashfiles=['a.txt', 'b.txt'], out='out.idx', memory_limit=0
+            )
+
+    def test_load_hashes_streamed(self):
+        """
+        Test streaming duplicates into the output with a memory limit
+        and removing them after writing.
+        """
+        groups = [('1', ['a', 'b']), ('2', ['c', 'd'])]
+        sysv = patch('sys.argv', [
+            __name__, '--load-hashes', '--hashfiles', 'a.txt',
+            '--memory-limit', '1000', '--keep-oldest', '-o', 'out.txt'
+        ])
+        stream = patch(
+            'bear.__main__.stream_duplicates', return_value=iter(groups)
+        )
+        events = []
+        remove = patch(
+            'bear.__main__.remove_except_oldest',
+            side_effect=lambda files: events.append(('remove', files))
+        )
+        output = patch(
+            'bear.__main__.output_duplicates',
+            side_effect=lambda hashes, out: events.extend(
+                ('write', key) for key, _ in hashes
+            )
+        )
+        # pylint: disable=confusing-with-statement
+        with sysv, stream as mock_stream, remove, output:
+            run()
+            mock_stream.assert_called_once_with(
+                hashfiles=['a.txt'], memory_limit=1000
+            )
+        # each group removed after it's written
+        self.assertEqual(events, [
+            ('write', '1'), ('remove', ['a', 'b']),
+            ('write', '2'), ('remove', ['c', 'd'])
+        ])
+
+    def test_load_hashes_link(self):
+        """
+        Test replacing streamed duplicates with hardlinks.
+        """
+        groups = [('1', ['a', 'b']), ('2', ['c', 'd'])]
+        sysv = patch('sys.argv', [
+            __name__, '--load-hashes', '--hashfiles', 'a.txt',
+            '--memory-limit', '1000', '--link', '-o', 'out.txt'
+        ])
+        stream = patch(
+            'bear.__main__.stream_duplicates', return_value=iter(groups)
+        )
+        output = patch(
+            'bear.__main__.output_duplicates',
+            side_effect=lambda hashes, out: list(hashes)
+        )
+        # pylint: disable=confusing-with-statement
+        with sysv, stream, output, patch(
+                'bear.__main__.LinkEngine'
+        ) as engine:
+            run()
+        self.assertEqual(
+            engine.return_value.__enter__.return_value.add.call_args_list,
+            [call(files=['a', 'b']), call(files=['c', 'd'])]
+        )
+
+    def test_keep_oldest(self):
+        """
+        Test removing all but the oldest file of each group of duplicates.
+        """
+        folder = mkdtemp()
+        for idx, name in enumerate('abcd'):
+            path = join(folder, name)
+            with open(path, 'w') as file:
+                file.write('x' if name in 'ab' else 'y')
+            utime(path, (idx, idx))
+        sysv = patch('sys.argv', [
+            __name__, '-d', folder, '-e', '-o', join(folder, 'out.txt')
+        ])
+        try:
+            with sysv, patch('bear.output.Pool', new=ThreadPool):
+                run()
+            self.assertEqual(sorted(listdir(folder)), ['a', 'c', 'out.txt'])
+        finally:
+            rmtree(folder)
+
+    def test_missing_hasher(self):
+        """
+        Test reporting a hasher of a missing package as a CLI error.
+        """
+        for option in (['--xxh3'], ['--md5', '--fingerprint', 'xxh3']):
+            sysv = patch('sys.argv', [__name__, '-d', '.'] + option)
+            missing = patch.dict('bear.hashers.HASHERS')
+            with sysv, missing, patch('bear.__main__.print'), patch(
+                    'sys.stderr'
+            ) as stderr, patch('bear.__main__.main') as mock_main:
+                from bear.hashers import HASHERS
+                HASHERS.pop(Hasher.XXH3, None)
+                with self.assertRaises(SystemExit) as exc:
+                    run()
+            self.assertEqual(exc.exception.code, 2)
+            mock_main.assert_not_called()
+            self.assertIn('thebear[fast]', ''.join(
+                args[0] for args, _ in stderr.write.call_args_list
+            ))
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,99 @@
+"""
+Test reading the files ahead of hashing them.
+"""
+
+from unittest import TestCase, main
+from unittest.mock import patch, ANY
+from os.path import join
+from argparse import Namespace
+from tempfile import mkdtemp
+from shutil import rmtree
+
+from bear.common import Hasher, Stage
+from bear.context import Context
+from bear.hashing import hash_file, hash_files, hash_text
+from bear.prefetch import Prefetcher, open_ahead
+
+
+class PrefetchCase(TestCase):
+    """
+    Test Prefetcher object.
+    """
+
+    def setUp(self):
+        self.folder = mkdtemp()
+        self.data = bytes(range(256)) * 10
+        self.paths = [join(self.folder, name) for name in 'abc']
+        for idx, path in enumerate(self.paths):
+            with open(path, 'wb') as file:
+                file.write(self.data[idx:])
+
+    def tearDown(self):
+        rmtree(self.folder)
+
+    def test_open_ahead(self):
+        """
+        Test advising the kernel to read the block of a stage.
+        """
+        with patch('bear.fileio.posix_fadvise') as advise:
+            with open_ahead(path=self.paths[0], offset=-10, length=10):
+                pass
+            advise.assert_called_once_with(ANY, 2550, 10, ANY)
+        self.assertIsNone(open_ahead(path=join(self.folder, 'x')))
+
+    def test_take(self):
+        """
+        Test taking the opened files in order and closing skipped ones.
+        """
+        with Prefetcher(paths=self.paths, depth=1) as reader:
+            first = reader.take(self.paths[0])
+            self.assertEqual(first.name, self.paths[0])
+            first.close()
+
+            # the second file was skipped
+            last = reader.take(self.paths[2])
+            self.assertEqual(last.name, self.paths[2])
+            last.close()
+            self.assertIsNone(reader.take(self.paths[0]))
+
+    def test_hash_file(self):
+        """
+        Test reading the blocks ahead into the same hashes.
+        """
+        with patch('bear.hashing.BUFFER_SIZE', 100):
+            with patch('bear.hashing.BUFFERS') as buffers:
+                # force new small buffers for this test
+                buffers.buffer = None
+                buffers.ahead = None
+                with Prefetcher(paths=self.paths) as reader:
+                    whole = hash_file(
+                        path=self.paths[0], hasher=Hasher.MD5, reader=reader
+                    )
+                    block = hash_file(
+                        path=self.paths[1], hasher=Hasher.MD5, offset=-250,
+                        size=150, reader=reader
+                    )
+        self.assertEqual(whole, hash_text(inp=self.data, hasher=Hasher.MD5))
+        self.assertEqual(block, hash_text(
+            inp=self.data[-250:-100], hasher=Hasher.MD5
+        ))
+
+    def test_hash_files(self):
+        """
+        Test hashing files in a stage with prefetching enabled.
+        """
+        ctx = Context(Namespace(prefetch=True, head_size=5))
+        self.assertEqual(hash_files(
+            files=self.paths, hasher=Hasher.MD5, ctx=ctx
+        ), hash_files(files=self.paths, hasher=Hasher.MD5))
+        self.assertEqual(hash_files(
+            files=self.paths[:2], hasher=Hasher.MD5, ctx=ctx,
+            stage=Stage.HEAD
+        ), {
+            hash_text(inp=self.data[:5], hasher=Hasher.MD5): self.paths[:1],
+            hash_text(inp=self.data[1:6], hasher=Hasher.MD5): self.paths[1:2]
+        })
+
+
+if __name__ == '__main__':
+    main()
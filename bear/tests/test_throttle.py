@@ -0,0 +1,96 @@
+"""
+Test limiting the rate of reads and opened files.
+"""
+
+from unittest import TestCase, main
+from unittest.mock import patch, call
+from os.path import join
+from tempfile import mkdtemp
+from shutil import rmtree
+
+from bear.common import Hasher
+from bear.hashing import hash_file, hash_text
+from bear.throttle import (
+    TokenBucket, LIMITS, set_rates, set_limits, pool_options
+)
+
+
+class ThrottleCase(TestCase):
+    """
+    Test token buckets shared by the workers.
+    """
+
+    def tearDown(self):
+        set_limits(limits={})
+
+    def test_acquire(self):
+        """
+        Test sleeping for the debt of the taken tokens.
+        """
+        with patch('bear.throttle.monotonic', return_value=10.0):
+            bucket = TokenBucket(rate=100)
+        self.assertEqual(bucket.burst, 100)
+
+        with patch('bear.throttle.sleep') as sleep:
+            with patch('bear.throttle.monotonic', return_value=10.0):
+                # a burst of a second worth of tokens is free
+                bucket.acquire(amount=100)
+                sleep.assert_not_called()
+
+                bucket.acquire(amount=50)
+                sleep.assert_called_once_with(0.5)
+
+            # refilled after a second, still 50 tokens short
+            with patch('bear.throttle.monotonic', return_value=11.0):
+                bucket.acquire(amount=100)
+            self.assertEqual(sleep.call_args_list, [call(0.5), call(0.5)])
+
+    def test_set_rates(self):
+        """
+        Test creating the buckets only for the limited operations.
+        """
+        set_rates()
+        self.assertEqual(LIMITS, {})
+        self.assertEqual(pool_options(), {})
+
+        set_rates(read_rate=10, open_rate=5)
+        self.assertEqual(sorted(LIMITS), ['open', 'read'])
+        self.assertEqual(LIMITS['read'].rate, 10)
+        self.assertEqual(LIMITS['open'].rate, 5)
+
+        options = pool_options()
+        self.assertEqual(options['initializer'], set_limits)
+        self.assertEqual(options['initargs'], (LIMITS, ))
+
+    def test_hash_file(self):
+        """
+        Test waiting for each opened file and read block.
+        """
+        folder = mkdtemp()
+        path = join(folder, 'file')
+        data = b'x' * 250
+        with open(path, 'wb') as file:
+            file.write(data)
+
+        set_rates(read_rate=1000, open_rate=10)
+        try:
+            with patch.object(LIMITS['read'], 'acquire') as read, \
+                    patch.object(LIMITS['open'], 'acquire') as opened, \
+                    patch('bear.hashing.BUFFER_SIZE', 100), \
+                    patch('bear.hashing.BUFFERS') as buffers:
+                buffers.buffer = None
+                self.assertEqual(
+                    hash_file(path=path, hasher=Hasher.MD5),
+                    hash_text(inp=data, hasher=Hasher.MD5)
+                )
+        finally:
+            rmtree(folder)
+
+        opened.assert_called_once_with()
+        self.assertEqual(read.call_args_list, [
+            call(100), call(100), call(50)
+        ])
+
+
+if __name__ == '__main__':
+    main()
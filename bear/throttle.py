@@ -0,0 +1,98 @@
+"""
+Module for limiting the rate of reads and opened files of all workers.
+"""
+
+from multiprocessing import Array
+from time import monotonic, sleep
+from ensure import ensure_annotations
+
+# token buckets of the limited operations, set in each worker process
+LIMITS = {}
+
+
+class TokenBucket:
+    """
+    Token bucket limiting an amount per second (e.g. bytes read) shared
+    by all processes and threads, the tokens and the time of the last
+    refill are kept in shared memory under its lock.
+
+    A worker takes the amount even if there aren't enough tokens and
+    sleeps until the debt is refilled, so the following workers queue
+    up behind it and the rate stays smooth even for big amounts.
+    """
+    # pylint: disable=too-few-public-methods
+
+    @ensure_annotations
+    def __init__(self, rate: int, burst: int = 0):
+        self.rate = rate
+        # a second worth of tokens by default
+        self.burst = burst or rate
+        self.state = Array('d', [self.burst, monotonic()])
+
+    @ensure_annotations
+    def acquire(self, amount: int = 1):
+        """
+        Take an amount of tokens, wait if there aren't enough of them.
+        """
+        with self.state.get_lock():
+            now = monotonic()
+            tokens = min(
+                self.burst,
+                self.state[0] + (now - self.state[1]) * self.rate
+            ) - amount
+            self.state[0] = tokens
+            self.state[1] = now
+        if tokens < 0:
+            sleep(-tokens / self.rate)
+
+
+@ensure_annotations
+def set_rates(read_rate: int = 0, open_rate: int = 0):
+    """
+    Create the token buckets for the limits in the master process,
+    0 means unlimited.
+    """
+    limits = {}
+    if read_rate:
+        limits['read'] = TokenBucket(rate=read_rate)
+    if open_rate:
+        limits['open'] = TokenBucket(rate=open_rate)
+    set_limits(limits=limits)
+
+
+@ensure_annotations
+def set_limits(limits: dict):
+    """
+    Use the token buckets of the master process, passed to the Pool
+    as the initializer of the worker processes.
+    """
+    LIMITS.clear()
+    LIMITS.update(limits)
+
+
+def pool_options() -> dict:
+    """
+    Get the keyword arguments of a Pool sharing the limits with its
+    workers, only if there are any limits.
+    """
+    if not LIMITS:
+        return {}
+    return {'initializer': set_limits, 'initargs': (dict(LIMITS), )}
+
+
+def throttle_read(amount: int):
+    """
+    Wait until an amount of bytes can be read.
+    """
+    bucket = LIMITS.get('read')
+    if bucket and amount:
+        bucket.acquire(amount)
+
+
+def throttle_open():
+    """
+    Wait until a file or a folder can be opened or stat()-ed.
+    """
+    bucket = LIMITS.get('open')
+    if bucket:
+        bucket.acquire()
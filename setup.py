@@ -72,7 +72,8 @@ KWARGS = dict(
             'setuptools', 'wheel',
             'twine', 'pyinstaller', 'requests'
         ],
-        'doc': ['sphinx>=2.2.0', "alabaster>=0.7.12"]
+        'doc': ['sphinx>=2.2.0', "alabaster>=0.7.12"],
+        'fast': ['xxhash>=2.0.0', 'blake3']
     },
     include_package_data=True,
     data_files=[(NAME, DATA)],